@@ -0,0 +1,132 @@
+import csv
+import io
+from passwords import hash_password, hash_passwords
+from models import db, User, Admin, Customer, Professional
+
+ROLES = ['admin', 'customer', 'professional']
+BULK_ROLES = ['customer', 'professional']  # admins are never created by import
+BULK_REGISTER_MAX_ROWS = 10000
+BULK_REGISTER_FIELDS = ['user_name', 'password', 'email_id', 'name', 'role']
+LOOKUP_CHUNK_SIZE = 500  # names per IN (...) when checking existing users
+
+# User creation for /register and the bulk import.
+#
+# A user and its role row are written in one transaction. Uniqueness of
+# user_name and email_id is left to the database: a clash surfaces as an
+# IntegrityError on insert, which duplicate_field() maps back to the column.
+
+
+def role_row(role, user_id):
+    if role == 'admin':
+        return Admin(user_id=user_id, admin_id=user_id)
+    if role == 'customer':
+        return Customer(user_id=user_id)
+    return Professional(user_id=user_id)
+
+
+def duplicate_field(error):
+    # Which unique column an IntegrityError is about, or None. SQLite names
+    # the column ("users.email_id"), PostgreSQL the constraint or index.
+    message = str(error.orig)
+    for field in ('email_id', 'user_name'):
+        if field in message:
+            return field
+    return None
+
+
+def create_user(user_name, password, email_id, name, role):
+    # Adds the user and role rows to the session; the caller commits.
+    user_id = db.session.execute(
+        db.insert(User).values(
+            name=name,
+            user_name=user_name,
+            email_id=email_id,
+            password=hash_password(password),
+            role=role
+        ).returning(User.user_id)
+    ).scalar_one()
+    db.session.add(role_row(role, user_id))
+    return user_id
+
+
+def read_bulk_rows(request):
+    # JSON ({"users": [...]} or a bare list) or CSV with a header row, either
+    # as the request body or as an uploaded file named "file".
+    if 'file' in request.files:
+        return list(csv.DictReader(io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig')))
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON list of users or a CSV upload")
+    return data
+
+
+def _existing(column, values):
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        found.update(db.session.execute(
+            db.select(column).where(column.in_(values[start:start + LOOKUP_CHUNK_SIZE]))
+        ).scalars())
+    return found
+
+
+def bulk_register(rows):
+    # Validates every row, then inserts the valid ones with executemany: one
+    # statement for users (RETURNING their ids) and one per role table, in a
+    # single transaction. Returns (created, errors); errors carry the index
+    # of the offending row. Existing names are looked up so each rejected row
+    # can be reported; a concurrent registration that slips past the lookup
+    # still fails the whole batch on the unique constraints.
+    errors = []
+    valid = []
+    seen = {'user_name': set(), 'email_id': set()}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'msg': "Expected an object"})
+            continue
+        row = {field: str(row.get(field) or '').strip() for field in BULK_REGISTER_FIELDS}
+        missing = [field for field in BULK_REGISTER_FIELDS if not row[field]]
+        if missing:
+            errors.append({'row': index, 'msg': f"Missing fields: {', '.join(missing)}"})
+        elif row['role'] not in BULK_ROLES:
+            errors.append({'row': index, 'msg': "Invalid role"})
+        elif row['user_name'] in seen['user_name']:
+            errors.append({'row': index, 'msg': "Duplicate username in upload"})
+        elif row['email_id'] in seen['email_id']:
+            errors.append({'row': index, 'msg': "Duplicate email in upload"})
+        else:
+            seen['user_name'].add(row['user_name'])
+            seen['email_id'].add(row['email_id'])
+            valid.append((index, row))
+
+    taken_names = _existing(User.user_name, seen['user_name'])
+    taken_emails = _existing(User.email_id, seen['email_id'])
+    accepted = []
+    for index, row in valid:
+        if row['user_name'] in taken_names:
+            errors.append({'row': index, 'msg': "Username already exists"})
+        elif row['email_id'] in taken_emails:
+            errors.append({'row': index, 'msg': "Email already exists"})
+        else:
+            accepted.append(row)
+    errors.sort(key=lambda error: error['row'])
+    if not accepted:
+        return 0, errors
+
+    hashes = hash_passwords([row['password'] for row in accepted])
+    user_ids = dict(db.session.execute(
+        db.insert(User).returning(User.user_name, User.user_id),
+        [{'name': row['name'], 'user_name': row['user_name'], 'email_id': row['email_id'],
+          'password': password_hash, 'role': row['role'],
+          'is_blocked': False} for row, password_hash in zip(accepted, hashes)],
+    ).all())
+    for role, model in (('customer', Customer), ('professional', Professional)):
+        role_rows = [{'user_id': user_ids[row['user_name']]} for row in accepted if row['role'] == role]
+        if role_rows:
+            db.session.execute(db.insert(model), role_rows)
+    db.session.commit()
+    return len(accepted), errors
@@ -0,0 +1,125 @@
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Benchmarks run against a throwaway SQLite file so they never touch
+# instance/database.sqlite3. This has to happen before main/models are
+# imported, since both read DATABASE_URL at import time.
+_bench_dir = tempfile.mkdtemp(prefix="household_bench_")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(_bench_dir, "bench.sqlite3"))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+from werkzeug.security import generate_password_hash
+
+from main import app
+from migrations import upgrade_schema
+from models import db, User, Customer, Professional, Service, ServiceRequest
+
+# main.py configures INFO logging; keep per-request log lines out of the timings.
+logging.getLogger().setLevel(logging.WARNING)
+
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        upgrade_schema(db)
+
+
+def seed(customers=1, professionals=1, services=5, requests=0, start=datetime(2024, 1, 1)):
+    # Bulk inserts through executemany; one shared password hash keeps
+    # seeding time out of the measurements.
+    password = generate_password_hash("password")
+    with app.app_context():
+        users = []
+        for i in range(customers):
+            users.append({'name': f'Customer {i}', 'user_name': f'customer{i}', 'email_id': f'customer{i}@example.com',
+                          'password': password, 'role': 'customer', 'is_blocked': False})
+        for i in range(professionals):
+            users.append({'name': f'Professional {i}', 'user_name': f'professional{i}', 'email_id': f'professional{i}@example.com',
+                          'password': password, 'role': 'professional', 'is_blocked': False})
+        db.session.execute(db.insert(User), users)
+        user_ids = dict(db.session.execute(db.select(User.user_name, User.user_id)).all())
+
+        db.session.execute(db.insert(Customer), [
+            {'customer_id': i + 1, 'user_id': user_ids[f'customer{i}']} for i in range(customers)
+        ])
+        db.session.execute(db.insert(Professional), [
+            {'professional_id': i + 1, 'user_id': user_ids[f'professional{i}'], 'approved': True} for i in range(professionals)
+        ])
+        db.session.execute(db.insert(Service), [
+            {'service_id': i + 1, 'name': f'Service {i}', 'price': 100.0 + i, 'location': f'Location {i % 10}',
+             'description': f'Description for service {i}'} for i in range(services)
+        ])
+        statuses = ['Pending', 'Accepted', 'Closed', 'Rejected']
+        if requests:
+            db.session.execute(db.insert(ServiceRequest), [
+                {'service_id': i % services + 1, 'professional_id': i % professionals + 1,
+                 'customer_id': i % customers + 1, 'request_date': start + timedelta(hours=i),
+                 'status': statuses[i % len(statuses)]} for i in range(requests)
+            ])
+        db.session.commit()
+        sync_sequences()
+        return user_ids
+
+
+def sync_sequences():
+    # seed() inserts explicit ids; on PostgreSQL move each id sequence past
+    # them so rows created through the API do not collide.
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model, key in ((Customer, 'customer_id'), (Professional, 'professional_id'),
+                       (Service, 'service_id'), (ServiceRequest, 'servicerequest_id'), (User, 'user_id')):
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), "
+            f"COALESCE((SELECT MAX({key}) FROM {table}), 0) + 1, false)"
+        ))
+    db.session.commit()
+
+
+def auth_header(user_id, role):
+    with app.app_context():
+        token = create_access_token(identity={"user_id": user_id, "role": role})
+    return {'Authorization': f'Bearer {token}'}
+
+
+class QueryCounter:
+    # Counts SQL statements issued on the app's engine while active.
+    def __init__(self):
+        self.count = 0
+
+    def _before_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        with app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, "before_cursor_execute", self._before_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before_execute)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_get(client, url, headers, repeat):
+    # Returns (median latency in ms, SQL statements per call).
+    samples = []
+    with QueryCounter() as counter:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            samples.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (url, response.status_code, response.get_data(as_text=True))
+    return statistics.median(samples), counter.count / repeat
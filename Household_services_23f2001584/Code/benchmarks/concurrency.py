@@ -0,0 +1,114 @@
+"""Write throughput while a CSV export runs: rollback journal vs the WAL settings.
+
+N threads create service requests through POST /customer/create_service_request
+while another thread keeps exporting service_requests to CSV, as the Celery
+worker would. Each mode runs on a freshly seeded database. Run from the Code
+directory:
+
+    python -m benchmarks.concurrency --writers 8 --seconds 10 --requests 200000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+import database
+from benchmarks.common import app, reset_database, seed, auth_header
+from exports import write_service_requests_csv
+import models
+from models import db
+
+MODES = [
+    # The previous behaviour: SQLite defaults, rollback journal.
+    ('rollback journal', {'journal_mode': 'DELETE'}),
+    ('wal + pragmas', dict(database.SQLITE_PRAGMAS)),
+]
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = 0
+        self.locked = 0
+        self.other_errors = 0
+        self.exports = 0
+        self.export_locked = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+def writer(headers, deadline, counters):
+    client = app.test_client()
+    body = {'service_id': 1, 'professional_id': 1, 'request_date': '2024-06-01'}
+    while time.monotonic() < deadline:
+        response = client.post('/customer/create_service_request', json=body, headers=headers)
+        if response.status_code == 201:
+            counters.add(created=1)
+        elif 'database is locked' in response.get_data(as_text=True):
+            counters.add(locked=1)
+        else:
+            counters.add(other_errors=1)
+
+
+def exporter(deadline, counters, path):
+    with app.app_context():
+        while time.monotonic() < deadline:
+            try:
+                write_service_requests_csv(path)
+                counters.add(exports=1)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'database is locked' not in str(e):
+                    raise
+                counters.add(export_locked=1)
+
+
+def run(pragmas, args):
+    database.SQLITE_PRAGMAS.clear()
+    database.SQLITE_PRAGMAS.update(pragmas)
+    # Changing journal_mode needs the only connection to the file.
+    for flask_app in (app, models.app):
+        with flask_app.app_context():
+            db.engine.dispose()
+    reset_database()
+    user_ids = seed(customers=1, professionals=1, services=1, requests=args.requests)
+    headers = auth_header(user_ids['customer0'], 'customer')
+
+    counters = Counters()
+    deadline = time.monotonic() + args.seconds
+    path = os.path.join(tempfile.mkdtemp(prefix="household_export_"), "export.csv")
+    threads = [threading.Thread(target=writer, args=(headers, deadline, counters)) for _ in range(args.writers)]
+    threads.append(threading.Thread(target=exporter, args=(deadline, counters, path)))
+    # The create route prints every request; keep that out of the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--requests', type=int, default=200000, help='rows seeded before the run')
+    args = parser.parse_args()
+
+    print(f"{'mode':<18} {'writes/s':>9} {'locked':>7} {'errors':>7} {'exports':>8} {'export locked':>14}")
+    for name, pragmas in MODES:
+        counters = run(pragmas, args)
+        print(f"{name:<18} {counters.created / args.seconds:>9.1f} {counters.locked:>7} "
+              f"{counters.other_errors:>7} {counters.exports:>8} {counters.export_locked:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+"""Load test: every route over HTTP, with per-endpoint throughput and latency.
+
+Seeds a throwaway database with the given volumes, serves the app on a
+loopback port with werkzeug's threaded server and runs --concurrency client
+threads against it for --seconds. Each thread picks weighted scenarios (a
+scenario may make several calls, e.g. approve then list) with its own seeded
+RNG, so two runs with the same arguments issue the same mix.
+
+The report is JSON: per "METHOD rule" the request count, errors, throughput,
+p50/p95/p99 latency and SQL statements per request (from the profiling
+histograms), plus which routes in app.url_map were not exercised. Run from
+the Code directory:
+
+    python -m benchmarks.load --customers 2000 --requests 50000 --seconds 30 --output load.json
+
+The CSV export routes need Celery and Redis; they are skipped unless
+--include-exports is given.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from flask_jwt_extended import create_access_token
+from werkzeug.serving import make_server
+
+from benchmarks.common import app, reset_database, seed, percentile
+from counters import reconcile
+from identity import identity_claims, identity_cache
+from matching import matches
+from models import db, User, Service, AvailabilitySlot, create_default_admin
+from profiling import request_metrics
+from rollups import roll_up_customer_activity
+from suggest import suggestions
+
+ACTORS = 200  # most customers/professionals given a token
+HTTP_TIMEOUT = 30  # seconds
+IGNORED_METHODS = {'HEAD', 'OPTIONS'}
+EXPORT_ROUTES = {
+    ('GET', '/download-csv'), ('GET', '/get-csv/<task_id>'), ('GET', '/get-csv/<task_id>/events'),
+}
+NOT_DRIVEN = {
+    # GET has no JSON body to read; the dashboard only POSTs here.
+    ('GET', '/customer/create_service_request'): "GET is not used by the frontend",
+}
+SEARCH_TERMS = ['serv', 'service 1', 'descr', 'location 3', 'prof', 'zzz']
+# Professionals 1..SCHEDULED_PROFESSIONALS publish working hours on
+# SLOT_DAYS days from SLOT_START and take timed bookings there; the rest
+# are booked by day. Their seeded requests are left out of the edit pools.
+SCHEDULED_PROFESSIONALS = 5
+SLOT_START = datetime(2030, 1, 1)
+SLOT_DAYS = 30
+
+# The dev server logs every request at INFO.
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+
+class Fixture:
+    # Ids and tokens the scenarios draw from, built once after seeding.
+    def __init__(self, args, user_ids):
+        self.args = args
+        customers, professionals = args.customers, args.professionals
+        block_pool = min(args.block_pool, customers - 1)
+        acting = min(ACTORS, customers - block_pool)
+        with app.app_context():
+            admin = User.query.filter_by(role='admin').first()
+            users = {user.user_name: user for user in User.query.filter(
+                User.user_name.in_([f'customer{i}' for i in range(acting)] +
+                                   [f'professional{i}' for i in range(min(ACTORS, professionals))]))}
+            self.admin = self._header(admin)
+            self.customers = [self._header(users[f'customer{i}']) for i in range(acting)]
+            self.professionals = [self._header(users[f'professional{i}']) for i in range(min(ACTORS, professionals))]
+
+        # seed() gives request r (1-based) customer (r-1) % customers and
+        # professional (r-1) % professionals.
+        self.scheduled = min(SCHEDULED_PROFESSIONALS, professionals - 1, len(self.professionals))
+        owned = [r for r in range(1, args.requests + 1)
+                 if (r - 1) % customers < acting and self.scheduled <= (r - 1) % professionals < len(self.professionals)]
+        deletable = owned[len(owned) - len(owned) // 10:]
+        self.editable = owned[:len(owned) - len(deletable)]
+        self.deletable = deque(deletable)
+        self.blockable = deque(user_ids[f'customer{i}'] for i in range(customers - block_pool, customers))
+        self.disposable_services = deque(range(args.services + 1, args.services + args.disposable_services + 1))
+        self.names = itertools.count()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _header(user):
+        return {'Authorization': 'Bearer ' + create_access_token(identity=identity_claims(user))}
+
+    def pop(self, pool):
+        with self.lock:
+            return pool.popleft() if pool else None
+
+    def customer_for(self, request_id):
+        return self.customers[(request_id - 1) % self.args.customers]
+
+    def professional_for(self, request_id):
+        return self.professionals[(request_id - 1) % self.args.professionals]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # label -> [ms]
+        self.errors = defaultdict(int)
+        self.adapter = app.url_map.bind('localhost')
+
+    def label(self, method, path):
+        rule, _ = self.adapter.match(path.split('?', 1)[0], method=method, return_rule=True)
+        return f"{method} {rule.rule}"
+
+    def add(self, label, elapsed_ms, ok):
+        with self.lock:
+            self.samples[label].append(elapsed_ms)
+            if not ok:
+                self.errors[label] += 1
+
+
+class Client:
+    def __init__(self, port, recorder):
+        self.port = port
+        self.recorder = recorder
+
+    def call(self, method, path, headers=None, body=None, ok=(200, 201)):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=HTTP_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            status = response.status
+        except OSError:
+            data, status = b'', None
+        finally:
+            connection.close()
+        self.recorder.add(self.recorder.label(method, path), (time.perf_counter() - started) * 1000, status in ok)
+        return status, data
+
+
+# Scenarios: (weight, function(client, fixture, rng)).
+
+def browse_services(client, fixture, rng):
+    headers = rng.choice(fixture.customers)
+    client.call('GET', '/customer/view_services?limit=20', headers)
+    client.call('GET', '/customer/view_professionals', headers)
+
+
+def search(client, fixture, rng):
+    term = quote(rng.choice(SEARCH_TERMS))
+    client.call('GET', f'/search/suggest?q={term[:4]}', rng.choice(fixture.customers))
+    client.call('GET', f'/customer/search_services?name={term}', rng.choice(fixture.customers))
+    client.call('GET', f'/admin/search_professionals?name={term}', fixture.admin)
+
+
+def customer_dashboard(client, fixture, rng):
+    headers = rng.choice(fixture.customers)
+    client.call('GET', '/customer/summary', headers)
+    client.call('GET', '/customer/manage_service_requests?limit=20', headers)
+
+
+def professional_dashboard(client, fixture, rng):
+    headers = rng.choice(fixture.professionals)
+    client.call('GET', '/professional/summary', headers)
+    client.call('GET', '/professional/service_requests?limit=20', headers)
+    client.call('GET', '/professional/view_services', headers)
+
+
+def admin_dashboard(client, fixture, rng):
+    client.call('GET', '/admin/summary', fixture.admin)
+    client.call('GET', '/admin/view_users?limit=20', fixture.admin)
+    client.call('GET', '/admin/users?limit=20', fixture.admin)
+    client.call('GET', '/admin/manage_services?limit=20', fixture.admin)
+    client.call('GET', '/admin/approve_professionals', fixture.admin)
+    client.call('GET', f"/admin/analytics/customer_activity?start=2024-01-01&end=2024-12-31"
+                       f"&group={rng.choice(['day', 'customer'])}", fixture.admin)
+    client.call('GET', '/admin/email_outbox', fixture.admin)
+
+
+def book(client, fixture, rng):
+    client.call('POST', '/customer/create_service_request', rng.choice(fixture.customers), {
+        'service_id': rng.randint(1, fixture.args.services),
+        'professional_id': rng.randint(fixture.scheduled + 1, fixture.args.professionals),
+        'request_date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+    })
+
+
+def book_slot(client, fixture, rng):
+    # Takes the first free stretch of the day; full days answer 409.
+    day = SLOT_START + timedelta(days=rng.randrange(SLOT_DAYS))
+    client.call('POST', '/customer/create_service_request', rng.choice(fixture.customers), {
+        'service_id': rng.randint(1, fixture.args.services),
+        'professional_id': rng.randint(1, fixture.scheduled),
+        'request_date': day.date().isoformat(), 'duration_minutes': rng.choice([30, 60, 90]),
+    }, ok=(201, 409))
+
+
+def match_professionals(client, fixture, rng):
+    client.call('GET', f'/customer/match_professionals?service_id={rng.randint(1, fixture.args.services)}'
+                       f'&date=2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.choice(fixture.customers))
+
+
+def check_availability(client, fixture, rng):
+    start = SLOT_START + timedelta(days=rng.randrange(SLOT_DAYS))
+    client.call('GET', f'/availability?professional_id={rng.randint(1, fixture.scheduled)}'
+                       f'&start={start.date()}&end={(start + timedelta(days=7)).date()}', rng.choice(fixture.customers))
+
+
+def manage_availability(client, fixture, rng):
+    # Each call publishes on a day of its own past the seeded slots, so it
+    # never overlaps, then withdraws the slot again.
+    professional = fixture.professionals[rng.randrange(fixture.scheduled)]
+    day = (SLOT_START + timedelta(days=SLOT_DAYS + next(fixture.names))).date()
+    status, data = client.call('POST', '/professional/availability', professional,
+                               {'slots': [{'start': f'{day}T09:00', 'end': f'{day}T17:00'}]})
+    client.call('GET', f'/professional/availability?start={day}', professional)
+    if status == 201:
+        client.call('DELETE', '/professional/availability', professional, {'slot_id': json.loads(data)['slots'][0]['slot_id']})
+
+
+def edit_request(client, fixture, rng):
+    request_id = rng.choice(fixture.editable)
+    client.call('PUT', '/customer/manage_service_requests', fixture.customer_for(request_id), {
+        'servicerequest_id': request_id, 'request_date': f'2024-06-{rng.randint(1, 28):02d}',
+    })
+
+
+def cancel_request(client, fixture, rng):
+    request_id = fixture.pop(fixture.deletable)
+    if request_id is not None:
+        client.call('DELETE', '/customer/manage_service_requests', fixture.customer_for(request_id),
+                    {'servicerequest_id': request_id})
+
+
+def update_status(client, fixture, rng):
+    # Random actions often hit a request that has moved on (409), which is
+    # an answer rather than an error.
+    request_id = rng.choice(fixture.editable)
+    client.call('POST', '/professional/service_requests/update_status', fixture.professional_for(request_id), {
+        'servicerequest_id': request_id, 'action': rng.choice(['accept', 'reject', 'close']),
+    }, ok=(200, 409))
+
+
+def bulk_update_status(client, fixture, rng):
+    professional = rng.randrange(len(fixture.professionals))
+    request_ids = [r for r in rng.sample(fixture.editable, min(200, len(fixture.editable)))
+                   if (r - 1) % fixture.args.professionals == professional]
+    if request_ids:
+        client.call('POST', '/professional/service_requests/bulk_update_status', fixture.professionals[professional], {
+            'items': [{'servicerequest_id': r, 'action': rng.choice(['accept', 'reject', 'close'])} for r in request_ids],
+        })
+
+
+def manage_services(client, fixture, rng):
+    client.call('POST', '/admin/create_service', fixture.admin, {
+        'name': f'Load service {next(fixture.names)}', 'price': 50, 'location': 'Location 1', 'description': 'Created by load test',
+    })
+    client.call('PUT', '/admin/manage_services', fixture.admin,
+                {'service_id': rng.randint(1, fixture.args.services), 'price': rng.randint(50, 500)})
+    service_id = fixture.pop(fixture.disposable_services)
+    if service_id is not None:
+        client.call('DELETE', '/admin/manage_services', fixture.admin, {'service_id': service_id})
+
+
+def manage_users(client, fixture, rng):
+    client.call('POST', '/admin/approve_professionals', fixture.admin,
+                {'professional_id': rng.randint(1, fixture.args.professionals)})
+    user_id = fixture.pop(fixture.blockable)
+    if user_id is not None:
+        client.call('POST', '/admin/block_users', fixture.admin, {'user_id': user_id})
+
+
+def accounts(client, fixture, rng):
+    client.call('POST', '/login', body={'user_name': f'customer{rng.randrange(len(fixture.customers))}', 'password': 'password'})
+    name = f'loaduser{next(fixture.names)}'
+    client.call('POST', '/register', body={
+        'user_name': name, 'password': 'password', 'email_id': f'{name}@example.com', 'name': name, 'role': 'customer',
+    })
+
+
+def bulk_import(client, fixture, rng):
+    names = [f'bulkuser{next(fixture.names)}' for _ in range(5)]
+    client.call('POST', '/admin/bulk_register', fixture.admin, {'users': [
+        {'user_name': name, 'password': 'password', 'email_id': f'{name}@example.com', 'name': name, 'role': 'customer'}
+        for name in names
+    ]})
+
+
+def pages(client, fixture, rng):
+    client.call('GET', '/')
+    client.call('GET', '/customer/dashboard')
+    client.call('GET', '/static/components/Customer_Dashboard.js')
+
+
+def internal(client, fixture, rng):
+    client.call('GET', '/internal/metrics')
+    client.call('GET', '/internal/profiles')
+
+
+def exports(client, fixture, rng):
+    status, data = client.call('GET', '/download-csv')
+    if status == 200:
+        task_id = json.loads(data)['task-id']
+        client.call('GET', f'/get-csv/{task_id}', ok=(200, 404))
+        client.call('GET', f'/get-csv/{task_id}/events')
+
+
+SCENARIOS = [
+    (20, browse_services), (15, search), (15, customer_dashboard), (15, professional_dashboard),
+    (5, admin_dashboard), (10, book), (5, edit_request), (2, cancel_request), (8, update_status), (1, bulk_update_status),
+    (4, book_slot), (4, check_availability), (5, match_professionals), (1, manage_availability), (2, manage_services), (1, manage_users), (1, accounts), (1, bulk_import), (3, pages), (1, internal),
+]
+
+
+def worker(port, fixture, recorder, scenarios, deadline, seed):
+    client = Client(port, recorder)
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in scenarios]
+    functions = [function for _, function in scenarios]
+    while time.monotonic() < deadline:
+        rng.choices(functions, weights)[0](client, fixture, rng)
+
+
+def prepare(args):
+    reset_database()
+    with app.app_context():
+        create_default_admin()
+    user_ids = seed(customers=args.customers, professionals=args.professionals,
+                    services=args.services, requests=args.requests)
+    with app.app_context():
+        db.session.execute(db.insert(Service), [
+            {'service_id': service_id, 'name': f'Disposable service {service_id}', 'price': 10.0,
+             'location': 'Nowhere', 'description': 'Deleted during the load test'}
+            for service_id in range(args.services + 1, args.services + args.disposable_services + 1)
+        ])
+        db.session.execute(db.insert(AvailabilitySlot), [
+            {'professional_id': professional_id, 'starts_at': SLOT_START + timedelta(days=day, hours=8),
+             'ends_at': SLOT_START + timedelta(days=day, hours=18)}
+            for professional_id in range(1, min(SCHEDULED_PROFESSIONALS, args.professionals - 1) + 1)
+            for day in range(SLOT_DAYS)
+        ])
+        db.session.commit()
+        reconcile()
+        roll_up_customer_activity()
+        suggestions.rebuild()
+        matches.rebuild()
+        identity_cache.clear()
+    return Fixture(args, user_ids)
+
+
+def coverage(recorder, include_exports):
+    driven = set(recorder.samples)
+    covered, skipped, missing = [], {}, []
+    for rule in app.url_map.iter_rules():
+        for method in sorted(rule.methods - IGNORED_METHODS):
+            label = f"{method} {rule.rule}"
+            if (method, rule.rule) in NOT_DRIVEN:
+                skipped[label] = NOT_DRIVEN[(method, rule.rule)]
+            elif (method, rule.rule) in EXPORT_ROUTES and not include_exports:
+                skipped[label] = "needs Celery and Redis; pass --include-exports"
+            elif label in driven:
+                covered.append(label)
+            else:
+                missing.append(label)
+    return {'covered': sorted(covered), 'skipped': skipped, 'missing': sorted(missing)}
+
+
+def sql_per_request():
+    counts = {}
+    for (metric, method, route), histogram in request_metrics.histograms.items():
+        if metric == 'http_request_sql_statements' and histogram.total:
+            counts[f"{method} {route}"] = histogram.sum / histogram.total
+    return counts
+
+
+def report(args, recorder, elapsed):
+    sql = sql_per_request()
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        endpoints[label] = {
+            'requests': len(samples),
+            'errors': recorder.errors[label],
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(samples, 50), 2),
+            'p95_ms': round(percentile(samples, 95), 2),
+            'p99_ms': round(percentile(samples, 99), 2),
+            'sql_per_request': round(sql[label], 2) if label in sql else None,
+        }
+    total = sum(len(samples) for samples in recorder.samples.values())
+    return {
+        'config': {name: getattr(args, name) for name in ('customers', 'professionals', 'services', 'requests',
+                                                           'concurrency', 'seconds', 'seed', 'include_exports')},
+        'elapsed_seconds': round(elapsed, 2),
+        'requests': total,
+        'errors': sum(recorder.errors.values()),
+        'throughput_rps': round(total / elapsed, 2),
+        'endpoints': endpoints,
+        'coverage': coverage(recorder, args.include_exports),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=500)
+    parser.add_argument('--professionals', type=int, default=100)
+    parser.add_argument('--services', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=1, help='base seed for the client RNGs')
+    parser.add_argument('--block-pool', type=int, default=50, help='customers reserved for the block scenario')
+    parser.add_argument('--disposable-services', type=int, default=200, help='services reserved for the delete scenario')
+    parser.add_argument('--include-exports', action='store_true', help='also drive the Celery-backed CSV export routes')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    fixture = prepare(args)
+    scenarios = SCENARIOS + ([(1, exports)] if args.include_exports else [])
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    request_metrics.reset()
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + args.seconds
+    threads = [threading.Thread(target=worker, args=(server.server_port, fixture, recorder, scenarios, deadline, args.seed + i))
+               for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    result = report(args, recorder, elapsed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"{result['requests']} requests, {result['throughput_rps']} req/s, {result['errors']} errors; "
+              f"{len(result['coverage']['missing'])} routes not exercised; report in {args.output}")
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Login throughput with hashing inline vs in the process pool.
+
+Several threads log in as fast as they can while one more thread times a
+cheap authenticated endpoint, showing how much a login storm slows the rest
+of the app. Run from the Code directory:
+
+    python -m benchmarks.login --threads 8 --seconds 10
+"""
+import argparse
+import os
+import threading
+import time
+
+import passwords
+from benchmarks.common import app, reset_database, seed, auth_header, percentile
+from models import db, User
+
+
+def login_storm(deadline, counts, lock):
+    client = app.test_client()
+    done = 0
+    while time.monotonic() < deadline:
+        response = client.post('/login', json={'user_name': f'customer{done % 50}', 'password': 'password'})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        done += 1
+    with lock:
+        counts.append(done)
+
+
+def probe(deadline, headers, samples):
+    client = app.test_client()
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        client.get('/search/suggest?q=serv', headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+
+
+def run(workers, args, headers):
+    passwords.shutdown_pool()
+    passwords.PASSWORD_HASH_WORKERS = workers
+    passwords.hash_password('warm up the pool')
+
+    counts, samples, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + args.seconds
+    threads = [threading.Thread(target=login_storm, args=(deadline, counts, lock)) for _ in range(args.threads)]
+    threads.append(threading.Thread(target=probe, args=(deadline, headers, samples)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / args.seconds, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='pool size for the pooled run')
+    args = parser.parse_args()
+
+    reset_database()
+    user_ids = seed(customers=50, services=5)
+    with app.app_context():
+        # seed() shares one werkzeug-default hash; store the configured one
+        # so no login in the run triggers a rehash.
+        db.session.execute(db.update(User).values(password=passwords.hash_password('password')))
+        db.session.commit()
+    headers = auth_header(user_ids['customer0'], 'customer')
+
+    cores = os.cpu_count() or 1
+    print(f"method {passwords.PASSWORD_HASH_METHOD}, {cores} cores")
+    print(f"{'hashing':<10} {'logins/s':>9} {'per core':>9} {'probe p50 ms':>13} {'probe p99 ms':>13}")
+    for name, workers in (('inline', 0), (f'pool x{args.workers}', args.workers)):
+        rate, samples = run(workers, args, headers)
+        used = 1 if workers == 0 else min(workers, cores)
+        print(f"{name:<10} {rate:>9.1f} {rate / used:>9.1f} {percentile(samples, 50):>13.2f} {percentile(samples, 99):>13.2f}")
+    passwords.shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
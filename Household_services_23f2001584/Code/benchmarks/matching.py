@@ -0,0 +1,105 @@
+"""Professional matching latency: ranked lookups at a large number of professionals.
+
+Seeds professionals with randomly spread request histories, then times
+matches.rank() directly (no HTTP, no JWT) against scoring every professional
+and taking the top k, checks both give the same answer and that no SQL is
+issued while ranking. Also times the incremental refresh of one touched
+professional. Run from the Code directory:
+
+    python -m benchmarks.matching --professionals 50000 --requests 500000 --repeat 2000
+"""
+import argparse
+import heapq
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import app, reset_database, seed, percentile, QueryCounter
+from counters import reconcile
+from matching import MATCH_LIMIT, free_on, location_key, matches
+from models import db, ServiceRequest
+
+STATUSES = ['Pending', 'Accepted', 'Closed', 'Rejected']
+LOCATIONS = [f'Location {i}' for i in range(10)] + ['Nowhere']  # seed() names 10 locations
+
+
+def seed_requests(requests, professionals, services, rng):
+    # Each professional works mostly on a few services, so location shares
+    # and completion rates differ between them.
+    start = datetime(2024, 1, 1)
+    with app.app_context():
+        favourites = {p: [rng.randint(1, services) for _ in range(3)] for p in range(1, professionals + 1)}
+        rows = []
+        for i in range(requests):
+            professional_id = rng.randint(1, professionals)
+            rows.append({
+                'service_id': rng.choice(favourites[professional_id]) if rng.random() < 0.8 else rng.randint(1, services),
+                'professional_id': professional_id, 'customer_id': 1, 'request_date': start + timedelta(minutes=i),
+                'status': rng.choices(STATUSES, weights=[1, 1, 4, 1])[0],
+            })
+            if len(rows) == 50000:
+                db.session.execute(db.insert(ServiceRequest), rows)
+                rows = []
+        if rows:
+            db.session.execute(db.insert(ServiceRequest), rows)
+        db.session.commit()
+
+
+def brute_force(location, limit):
+    key = location_key(location)
+    return heapq.nsmallest(limit, ((-item.score(key), professional_id) for professional_id, item in matches.features.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--professionals', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=500000)
+    parser.add_argument('--services', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=MATCH_LIMIT)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    reset_database()
+    seed(customers=1, professionals=args.professionals, services=args.services)
+    seed_requests(args.requests, args.professionals, args.services, rng)
+    with app.app_context():
+        reconcile()
+        db.session.commit()
+        started = time.perf_counter()
+        matches.rebuild()
+        print(f"index build: {(time.perf_counter() - started) * 1000:.0f} ms, {len(matches.features)} professionals")
+        available = free_on(date.today(), 60)
+
+    print(f"{'location':<12} {'rank p50 us':>12} {'rank p99 us':>12} {'scan p50 us':>12}")
+    with QueryCounter() as counter:
+        for location in LOCATIONS:
+            ranked = matches.rank(location, args.limit, available)
+            expected = brute_force(location, args.limit)
+            assert [(round(-score, 9), p) for p, score, _ in ranked] == [(round(s, 9), p) for s, p in expected], location
+            samples, scans = [], []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                matches.rank(location, args.limit, available)
+                samples.append((time.perf_counter() - started) * 1e6)
+            for _ in range(max(args.repeat // 100, 3)):
+                started = time.perf_counter()
+                brute_force(location, args.limit)
+                scans.append((time.perf_counter() - started) * 1e6)
+            print(f"{location:<12} {percentile(samples, 50):>12.1f} {percentile(samples, 99):>12.1f} {percentile(scans, 50):>12.0f}")
+    assert counter.count == 0, f"{counter.count} SQL statements issued by lookups"
+
+    with app.app_context():
+        samples = []
+        with QueryCounter() as counter:
+            for professional_id in rng.sample(range(1, args.professionals + 1), 200):
+                matches.touch(professional_id)
+                started = time.perf_counter()
+                matches.refresh()
+                samples.append((time.perf_counter() - started) * 1e6)
+        print(f"refresh of one touched professional: p50 {percentile(samples, 50):.0f} us, "
+              f"{counter.count / len(samples):.0f} SQL statements")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Email outbox throughput: messages per second and SQL per message by batch size.
+
+Queues --messages emails, drains them into a local SMTP sink (see
+smtp_throughput) with each batch size in turn, and checks that every email
+was delivered exactly once and marked sent. Then drains with --workers
+threads at once, replays a worker that died after claiming a batch, to check
+the lease hands its rows to the next run, and stops a run mid-batch, to
+check the unsent rows are handed back without counting an attempt. A row
+abandoned on its last attempt has to fail rather than be sent again. The
+per-worker rate limit is off so the numbers show the outbox itself. Run from
+the Code directory:
+
+    python -m benchmarks.outbox --messages 5000 --connect-ms 2
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database, QueryCounter
+from benchmarks.smtp_throughput import SinkServer
+from mailservices import SMTPPool
+from models import db, EmailOutbox
+from outbox import OUTBOX_MAX_ATTEMPTS, RateLimiter, claim_batch, drain, enqueue_many
+
+BATCH_SIZES = [1, 10, 100, 500]
+
+
+def queue_messages(count):
+    with app.app_context():
+        db.session.execute(db.delete(EmailOutbox))
+        enqueue_many('benchmark', ((f"user{i}@example.com", "Benchmark", f"<p>message {i}</p>") for i in range(count)))
+        db.session.commit()
+
+
+def sent_rows():
+    with app.app_context():
+        return db.session.execute(
+            db.select(db.func.count()).where(EmailOutbox.status == 'sent')
+        ).scalar()
+
+
+def run_drain(pool, batch_size, summaries):
+    with app.app_context():
+        summaries.append(drain(batch_size=batch_size, pool=pool, rate_limiter=RateLimiter(0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--connect-ms', type=float, default=2.0,
+                        help='delay before the server greeting, standing in for network round-trips')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    reset_database()
+    server = SinkServer(args.connect_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pool = SMTPPool(*server.server_address)
+
+    print(f"{'batch size':>10} {'msg/s':>10} {'SQL/msg':>8}")
+    for batch_size in BATCH_SIZES:
+        queue_messages(args.messages)
+        server.received = 0
+        summaries = []
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            run_drain(pool, batch_size, summaries)
+            elapsed = time.perf_counter() - started
+        assert summaries[0]['sent'] == server.received == sent_rows() == args.messages, (summaries, server.received)
+        print(f"{batch_size:>10} {args.messages / elapsed:>10.1f} {counter.count / args.messages:>8.3f}")
+
+    queue_messages(args.messages)
+    server.received = 0
+    summaries = []
+    threads = [threading.Thread(target=run_drain, args=(pool, 100, summaries)) for _ in range(args.workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    claimed = sum(summary['claimed'] for summary in summaries)
+    assert claimed == server.received == sent_rows() == args.messages, (summaries, server.received)
+    print(f"{args.workers} workers, batch 100: {args.messages / elapsed:.1f} msg/s, no email claimed twice")
+
+    # A worker that claims a batch and dies: nothing is sent until the lease
+    # runs out (moved forward here), then the next drain sends it.
+    queue_messages(100)
+    server.received = 0
+    with app.app_context():
+        assert len(claim_batch(100)) == 100
+        assert drain(pool=pool, rate_limiter=RateLimiter(0))['claimed'] == 0
+        db.session.execute(db.update(EmailOutbox).values(available_at=datetime.now() - timedelta(seconds=1)))
+        db.session.commit()
+        summary = drain(pool=pool, rate_limiter=RateLimiter(0))
+        attempts = set(db.session.execute(db.select(EmailOutbox.attempts)).scalars())
+    assert summary['sent'] == server.received == 100 and attempts == {2}, (summary, attempts)
+    print("expired lease: 100 abandoned emails sent by the next drain")
+
+    # A run that reaches its deadline part way through a batch.
+    queue_messages(100)
+    server.received = 0
+    with app.app_context():
+        first = drain(max_seconds=0.3, pool=pool, rate_limiter=RateLimiter(100))
+        second = drain(pool=pool, rate_limiter=RateLimiter(0))
+        attempts = set(db.session.execute(db.select(EmailOutbox.attempts)).scalars())
+    assert first['released'] and first['sent'] + first['released'] == 100, first
+    assert second['sent'] == first['released'] and server.received == sent_rows() == 100 and attempts == {1}, (second, attempts)
+    print(f"deadline: {first['released']} unsent emails handed back and sent by the next drain")
+
+    # A worker that died on the last attempt: the row fails instead of being
+    # claimed again.
+    queue_messages(10)
+    server.received = 0
+    with app.app_context():
+        db.session.execute(db.update(EmailOutbox).values(status='sending', attempts=OUTBOX_MAX_ATTEMPTS,
+                                                         available_at=datetime.now() - timedelta(seconds=1)))
+        db.session.commit()
+        summary = drain(pool=pool, rate_limiter=RateLimiter(0))
+    assert summary['claimed'] == server.received == 0 and summary['failed'] == 10, summary
+    print("last attempt abandoned: 10 emails failed, none sent again")
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Check that service request and availability queries are index-driven.
+
+Runs each endpoint and task query that reads service_requests or
+availability_slots, records the SQL it issues and runs EXPLAIN QUERY PLAN on
+every statement. Exits non-zero if any of them falls back to a full scan of
+either table. Run from the Code directory:
+
+    python -m benchmarks.query_plans
+"""
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from benchmarks.common import app, reset_database, seed, auth_header
+from models import db
+from queries import pending_requests_by_professional
+from rollups import roll_up_day
+from matching import _load_features
+from schedule import booked_in_database, schedules, slot_overlap_in_database
+
+ENDPOINTS = [
+    ('/professional/service_requests', 'professional'),
+    ('/customer/manage_service_requests', 'customer'),
+]
+
+
+TABLES = ('service_requests', 'availability_slots')
+
+
+def locked(probe, *args):
+    # The probes lock the professional; release it as the routes would.
+    try:
+        return probe(*args)
+    finally:
+        db.session.rollback()
+
+
+TASK_QUERIES = [
+    ('pending requests', lambda: list(pending_requests_by_professional())),
+    ('daily activity rollup', lambda: roll_up_day(date(2024, 1, 1))),
+    ('booking overlap probe', lambda: locked(booked_in_database, 1, datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 10))),
+    ('slot overlap probe', lambda: locked(slot_overlap_in_database, 1, [(datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 10))])),
+    ('schedule index rebuild', schedules.rebuild),
+    ('match features of touched professionals', lambda: _load_features({1, 2})),
+]
+
+
+def full_scans(conn, statement, parameters):
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    details = [row[-1] for row in plan]
+    return [detail for detail in details
+            if any(detail.startswith(f'SCAN {table}') for table in TABLES) and 'INDEX' not in detail], details
+
+
+def main():
+    reset_database()
+    user_ids = seed(customers=5, professionals=5, services=10, requests=500)
+    headers = {
+        'customer': auth_header(user_ids['customer0'], 'customer'),
+        'professional': auth_header(user_ids['professional0'], 'professional'),
+    }
+    client = app.test_client()
+
+    def call_endpoint(url, role):
+        response = client.get(url, headers=headers[role])
+        assert response.status_code == 200, (url, response.status_code)
+
+    checks = [(url, lambda url=url, role=role: call_endpoint(url, role)) for url, role in ENDPOINTS]
+    checks += TASK_QUERIES
+
+    failures = 0
+    with app.app_context():
+        engine = db.engine
+        statements = []
+        current = {}
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if any(table in statement for table in TABLES):
+                statements.append((current['name'], statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            for name, run in checks:
+                current['name'] = name
+                run()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        with engine.connect() as conn:
+            for name, statement, parameters in statements:
+                scans, details = full_scans(conn, statement, parameters)
+                failures += bool(scans)
+                print(f"[{'FAIL' if scans else 'ok'}] {name}: {' | '.join(details)}")
+
+    if failures:
+        print(f"{failures} statement(s) scan {' or '.join(TABLES)} without an index")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Search latency: the previous ilike('%name%') scan vs the FTS5 index.
+
+Seeds a large services table with varied names and times the same search
+terms both ways, through the ORM, so only the query strategy differs. Run from the Code
+directory:
+
+    python -m benchmarks.search --services 100000 --repeat 50
+"""
+import argparse
+import time
+
+from benchmarks.common import app, reset_database, percentile
+from models import db, Service
+import search
+
+TRADES = ['Plumbing', 'Electrical', 'Carpentry', 'Painting', 'Cleaning', 'Pest Control', 'Gardening',
+          'Appliance Repair', 'Roofing', 'Locksmith', 'Moving', 'Tiling', 'Plastering', 'Glazing']
+KINDS = ['Express', 'Deep', 'Emergency', 'Weekend', 'Premium', 'Basic', 'Seasonal', 'Commercial']
+CITIES = ['Chennai', 'Mumbai', 'Delhi', 'Pune', 'Kolkata', 'Hyderabad', 'Jaipur', 'Lucknow']
+# Typed prefixes, full words, multi-word, a single id and a miss.
+TERMS = ['plu', 'elect', 'deep clean', 'emergency lock', 'gardening 77777', 'pune', 'zzz']
+
+
+def seed_services(count):
+    with app.app_context():
+        db.session.execute(db.insert(Service), [
+            {'service_id': i + 1,
+             'name': f'{KINDS[i % len(KINDS)]} {TRADES[i // len(KINDS) % len(TRADES)]} {i}',
+             'price': 100.0 + i % 500, 'location': CITIES[i % len(CITIES) - 3],
+             'description': f'{TRADES[i % len(TRADES)]} work by verified professionals'}
+            for i in range(count)
+        ])
+        db.session.commit()
+
+
+def like_scan(term):
+    # As the endpoint ran before: every match, unranked.
+    return Service.query.filter(Service.name.ilike(f'%{term}%')).all()
+
+
+def fts(term):
+    return search.search_services(term)
+
+
+def measure(find, repeat):
+    samples = []
+    with app.app_context():
+        for _ in range(repeat):
+            for term in TERMS:
+                started = time.perf_counter()
+                find(term)
+                samples.append((time.perf_counter() - started) * 1000)
+                db.session.rollback()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--services', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    reset_database()
+    seed_services(args.services)
+
+    print(f"{'strategy':<12} {'services':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, find in (('like scan', like_scan), ('fts5', fts)):
+        samples = measure(find, args.repeat)
+        print(f"{name:<12} {args.services:>9} {percentile(samples, 50):>9.2f} {percentile(samples, 99):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Latency of the service request listings versus number of requests.
+
+Run from the Code directory:
+
+    python -m benchmarks.service_requests --counts 100 500 2000 --repeat 20
+"""
+import argparse
+
+from benchmarks.common import app, reset_database, seed, auth_header, time_get
+
+ENDPOINTS = [
+    ('/professional/service_requests', 'professional'),
+    ('/customer/manage_service_requests', 'customer'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 500, 1000, 2000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'endpoint':<36} {'requests':>8} {'median ms':>10} {'queries':>8}")
+    for count in args.counts:
+        reset_database()
+        user_ids = seed(customers=1, professionals=1, services=20, requests=count)
+        headers = {
+            'customer': auth_header(user_ids['customer0'], 'customer'),
+            'professional': auth_header(user_ids['professional0'], 'professional'),
+        }
+        for url, role in ENDPOINTS:
+            latency, queries = time_get(client, url, headers[role], args.repeat)
+            print(f"{url:<36} {count:>8} {latency:>10.2f} {queries:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Messages per second: one SMTP connection per message vs the pooled sender.
+
+Starts a local SMTP sink (a MailHog stand-in that accepts and discards mail)
+and sends the same messages both ways. Run from the Code directory:
+
+    python -m benchmarks.smtp_throughput --messages 2000 --connect-ms 2
+"""
+import argparse
+import smtplib
+import socketserver
+import threading
+import time
+
+import mailservices
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 5321 for smtplib.send_message.
+    def handle(self):
+        time.sleep(self.server.connect_delay)
+        self.wfile.write(b"220 sink ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.wfile.write(b"250 sink\r\n")
+            elif command == b"DATA":
+                self.wfile.write(b"354 go ahead\r\n")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.received += 1
+                self.wfile.write(b"250 queued\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay):
+        super().__init__(("127.0.0.1", 0), SinkHandler)
+        self.connect_delay = connect_delay
+        self.received = 0
+
+
+def send_unpooled(host, port, messages):
+    # The previous send_test_email: a new connection for every message.
+    for to_email, subject, html_content in messages:
+        with smtplib.SMTP(host=host, port=port) as client:
+            client.send_message(mailservices.build_message(to_email, subject, html_content))
+
+
+def send_pooled(host, port, messages):
+    pool = mailservices.SMTPPool(host=host, port=port)
+    results = list(pool.send_many(messages))
+    pool.close()
+    assert all(result.ok for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--connect-ms', type=float, default=2.0,
+                        help='delay before the server greeting, standing in for network round-trips')
+    args = parser.parse_args()
+
+    server = SinkServer(args.connect_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    messages = [(f"user{i}@example.com", "Benchmark", f"<p>message {i}</p>") for i in range(args.messages)]
+
+    for name, send in (('one connection per message', send_unpooled), ('pooled sender', send_pooled)):
+        server.received = 0
+        started = time.perf_counter()
+        send(host, port, messages)
+        elapsed = time.perf_counter() - started
+        assert server.received == len(messages)
+        print(f"{name:<28} {len(messages) / elapsed:>10.1f} msg/s")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Typeahead latency: prefix index lookups at a large number of services.
+
+Times suggestions.suggest() directly (no HTTP, no JWT) and checks that no
+SQL is issued while answering. Run from the Code directory:
+
+    python -m benchmarks.suggest --services 100000 --repeat 2000
+"""
+import argparse
+import time
+
+from benchmarks.common import app, reset_database, percentile, QueryCounter
+from benchmarks.search import seed_services
+from suggest import suggestions
+
+PREFIXES = ['p', 'pl', 'plu', 'deep c', 'emergency lo', 'gardening 7777', 'zzz']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--services', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    reset_database()
+    seed_services(args.services)
+    with app.app_context():
+        started = time.perf_counter()
+        suggestions.rebuild()
+        print(f"index build: {(time.perf_counter() - started) * 1000:.0f} ms, {len(suggestions.entries)} entries")
+
+    print(f"{'prefix':<16} {'p50 us':>8} {'p99 us':>8}")
+    with QueryCounter() as counter:
+        for prefix in PREFIXES:
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                suggestions.suggest(prefix)
+                samples.append((time.perf_counter() - started) * 1e6)
+            print(f"{prefix:<16} {percentile(samples, 50):>8.1f} {percentile(samples, 99):>8.1f}")
+    assert counter.count == 0, f"{counter.count} SQL statements issued by lookups"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import functools
+import logging
+from flask import request, make_response, Response
+from flask_caching import Cache
+from flask_jwt_extended import get_jwt_identity
+
+logger = logging.getLogger(__name__)
+
+cache = Cache()
+
+# Response cache for read-only GET endpoints.
+#
+# Keys are built from the route path, the sorted query string and, where the
+# response or its access check depends on the caller, the JWT role or user id.
+# Each key also embeds the current version of every tag the view reads from;
+# a mutation calls invalidate(tag), which bumps the version so existing
+# entries for that tag are never read again and simply expire.
+#
+# cached_response must sit below @jwt_required() so authentication runs
+# before the cache is consulted. Only 200 responses are stored, and auth
+# endpoints must never use it.
+
+
+def _tag_key(tag):
+    # Plain integers bumped with INCR (the backend's inc(); the Cache wrapper
+    # does not expose it). Never write these with set(), which pickles the
+    # value so INCR refuses it.
+    return f"tag-counter:{tag}"
+
+
+def _tag_versions(tags):
+    versions = cache.get_many(*[_tag_key(tag) for tag in tags])
+    return ".".join(str(version or 0) for version in versions)
+
+
+def _identity_part(vary):
+    if vary is None:
+        return ""
+    identity = get_jwt_identity()
+    if vary == 'role':
+        return f"role={identity['role']}"
+    return f"user={identity['user_id']}"
+
+
+def make_key(tags, vary):
+    args = "&".join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    return f"response:{request.path}?{args}:{_identity_part(vary)}:{_tag_versions(tags)}"
+
+
+def cached_response(timeout, tags, vary=None):
+    # vary: None (same response for every caller), 'role' or 'user'.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                key = make_key(tags, vary)
+                hit = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache unavailable: {e}")
+                return view(*args, **kwargs)
+            if hit is not None:
+                body, mimetype = hit
+                return Response(body, status=200, mimetype=mimetype)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                try:
+                    cache.set(key, (response.get_data(), response.mimetype), timeout=timeout)
+                except Exception as e:
+                    logger.warning(f"Response cache unavailable: {e}")
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    # One atomic increment per tag, so concurrent invalidations cannot lose a
+    # bump. Tag versions never expire: if one reset to an old value, entries
+    # cached under that value would become readable again.
+    for tag in tags:
+        try:
+            cache.cache.inc(_tag_key(tag))
+        except Exception as e:
+            logger.warning(f"Could not invalidate cache tag {tag}: {e}")
@@ -0,0 +1,82 @@
+from collections import Counter
+from sqlalchemy.dialects import postgresql, sqlite
+from migrations import rebuild_request_counters
+from models import db, RequestCounter
+
+# Per-status service request counts, read by the dashboard summaries.
+#
+# Every handler that creates, deletes or changes a service request calls
+# track() with the request's (customer_id, professional_id, status) before
+# and after the change, before it commits, so the counters move in the same
+# transaction as the row. reconcile() rebuilds the table from scratch and
+# runs nightly to repair any drift (e.g. rows changed outside the API).
+#
+# There is no overall row: every write would update the same few rows, which
+# serializes concurrent bookings on PostgreSQL. total_counts() sums the
+# professional rows instead, one per professional and status.
+
+SCOPES = ('customer', 'professional')
+
+
+def snapshot(service_request):
+    return (service_request.customer_id, service_request.professional_id, service_request.status)
+
+
+def _keys(state):
+    customer_id, professional_id, status = state
+    return [('customer', customer_id, status), ('professional', professional_id, status)]
+
+
+def track(before, after):
+    # before/after are snapshot() tuples, or None for a created/deleted row.
+    track_many([(before, after)])
+
+
+def track_many(changes):
+    # Several (before, after) pairs applied as one batch of upserts.
+    deltas = Counter()
+    for before, after in changes:
+        if before is not None:
+            deltas.subtract(_keys(before))
+        if after is not None:
+            deltas.update(_keys(after))
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    # Upserts count = count + delta for each (scope, owner_id, status).
+    rows = [{'scope': scope, 'owner_id': owner_id, 'status': status, 'count': delta}
+            for (scope, owner_id, status), delta in deltas.items() if delta]
+    if not rows:
+        return
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(RequestCounter)
+    statement = statement.on_conflict_do_update(
+        index_elements=['scope', 'owner_id', 'status'],
+        set_={'count': RequestCounter.count + statement.excluded['count']},
+    )
+    db.session.execute(statement, rows)
+
+
+def status_counts(scope, owner_id):
+    rows = db.session.execute(
+        db.select(RequestCounter.status, RequestCounter.count)
+        .where(RequestCounter.scope == scope, RequestCounter.owner_id == owner_id, RequestCounter.count != 0)
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def total_counts():
+    # Counts over all service requests; each has exactly one professional.
+    total = db.func.sum(RequestCounter.count)
+    rows = db.session.execute(
+        db.select(RequestCounter.status, total)
+        .where(RequestCounter.scope == 'professional')
+        .group_by(RequestCounter.status)
+        .having(total != 0)
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def reconcile():
+    rebuild_request_counters(db)
@@ -0,0 +1,117 @@
+import csv
+import gzip
+import io
+import os
+import time
+from models import db, ServiceRequest, DataVersion
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports"))
+EXPORT_BATCH_SIZE = 1000  # rows fetched per round-trip from the cursor
+EXPORT_COLUMNS = ["servicerequest_id", "service_id", "professional_id", "customer_id", "status"]
+EXPORT_MAX_AGE = 24 * 60 * 60  # seconds before a cached export file is evicted
+EXPORT_MAX_TOTAL_BYTES = 1024 * 1024 * 1024  # oldest files are evicted past this
+EXPORT_REGISTRY_TIMEOUT = EXPORT_MAX_AGE
+
+
+def export_path(name, compress=False):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return os.path.join(EXPORT_DIR, f"{name}.csv.gz" if compress else f"{name}.csv")
+
+
+def write_service_requests_csv(path, compress=False, progress=None, progress_every=10000):
+    # Streams service_requests into a CSV (optionally gzipped) file. Rows come
+    # from a server-side cursor (on backends that have one) EXPORT_BATCH_SIZE
+    # at a time and go straight to the writer, so memory use does not depend
+    # on table size. The file is
+    # written under a temporary name and renamed once complete, so a reader
+    # never sees a partial export.
+    query = (
+        db.select(*(getattr(ServiceRequest, column) for column in EXPORT_COLUMNS))
+        .order_by(ServiceRequest.servicerequest_id)
+        .execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+    )
+    partial_path = path + ".part"
+    raw = gzip.open(partial_path, "wb") if compress else open(partial_path, "wb")
+    rows_written = 0
+    try:
+        with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+            for partition in db.session.execute(query).partitions():
+                writer.writerows(partition)
+                rows_written += len(partition)
+                if progress and rows_written % progress_every < len(partition):
+                    progress(rows_written)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return rows_written
+
+
+def data_fingerprint():
+    # Changes whenever service_requests does: the highest id catches inserts,
+    # the trigger-maintained version counters catch updates and deletes.
+    max_id = db.session.execute(db.select(db.func.max(ServiceRequest.servicerequest_id))).scalar()
+    version = db.session.execute(
+        db.select(db.func.sum(DataVersion.version)).where(DataVersion.table_name == 'service_requests')
+    ).scalar()
+    return f"{max_id or 0}-{version or 0}"
+
+
+class ExportRegistry:
+    # Maps a data fingerprint to the export task building (or that built) the
+    # file for it, and task ids back to file paths. Backed by the app cache,
+    # so every web process sees the same entries.
+
+    def __init__(self, cache, timeout=EXPORT_REGISTRY_TIMEOUT):
+        self.cache = cache
+        self.timeout = timeout
+
+    @staticmethod
+    def _key(fingerprint, compress):
+        return f"export:{fingerprint}:{'gz' if compress else 'csv'}"
+
+    def claim(self, fingerprint, compress, task_id, filename):
+        # Registers task_id for this fingerprint unless another request got
+        # there first. Returns the entry that owns the fingerprint.
+        entry = {'task_id': task_id, 'filename': filename}
+        if self.cache.add(self._key(fingerprint, compress), entry, timeout=self.timeout):
+            self.cache.set(f"export-task:{task_id}", filename, timeout=self.timeout)
+            return entry
+        return self.cache.get(self._key(fingerprint, compress))
+
+    def release(self, fingerprint, compress):
+        self.cache.delete(self._key(fingerprint, compress))
+
+    def filename_for_task(self, task_id):
+        return self.cache.get(f"export-task:{task_id}")
+
+
+def evict_exports(keep=(), max_age=EXPORT_MAX_AGE, max_total_bytes=EXPORT_MAX_TOTAL_BYTES):
+    # Deletes export files older than max_age, then the oldest remaining ones
+    # until the directory is under max_total_bytes. Paths in keep are spared.
+    if not os.path.isdir(EXPORT_DIR):
+        return []
+    now = time.time()
+    files = []
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_file() and not entry.name.endswith(".part"):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+
+    evicted = []
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        if path in keep:
+            continue
+        if now - mtime > max_age or total > max_total_bytes:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted.append(path)
+    return evicted
@@ -0,0 +1,67 @@
+import threading
+import time
+from models import db, User, Customer, Professional
+
+IDENTITY_CACHE_TTL = 60  # seconds between reloads of the blocked-user set
+
+# Everything authorization needs travels in the JWT identity: user_id, role,
+# customer_id / professional_id and is_blocked, so endpoints do not look the
+# user up again. The one thing a token cannot know is that its user was
+# blocked after it was issued. Each process keeps the set of blocked user ids
+# in memory, reloads it with one query every IDENTITY_CACHE_TTL seconds, and
+# block_users adds to it directly, so revocation is immediate in the process
+# that handled the block and at most IDENTITY_CACHE_TTL late in the others.
+
+
+def identity_claims(user):
+    return {
+        "user_id": user.user_id,
+        "role": user.role,
+        "customer_id": user.customer.customer_id if user.role == 'customer' and user.customer else None,
+        "professional_id": user.professional.professional_id if user.role == 'professional' and user.professional else None,
+        "is_blocked": bool(user.is_blocked),
+    }
+
+
+def role_id(identity, role):
+    # The customer_id / professional_id for this identity. Tokens issued
+    # before these claims existed fall back to a lookup.
+    key = f"{role}_id"
+    if key in identity:
+        return identity[key]
+    model = Customer if role == 'customer' else Professional
+    row = db.session.execute(db.select(model).where(model.user_id == identity['user_id'])).scalar()
+    return getattr(row, key) if row else None
+
+
+class IdentityCache:
+    def __init__(self, ttl=IDENTITY_CACHE_TTL):
+        self.ttl = ttl
+        self.blocked = set()
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def _reload(self):
+        blocked = set(db.session.execute(db.select(User.user_id).where(User.is_blocked == True)).scalars())
+        with self.lock:
+            self.blocked = blocked
+            self.loaded_at = time.monotonic()
+
+    def is_revoked(self, identity):
+        if identity.get('is_blocked'):
+            return True
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            self._reload()
+        return identity['user_id'] in self.blocked
+
+    def revoke(self, user_id):
+        with self.lock:
+            self.blocked = self.blocked | {user_id}
+
+    def clear(self):
+        with self.lock:
+            self.blocked = set()
+            self.loaded_at = None
+
+
+identity_cache = IdentityCache()
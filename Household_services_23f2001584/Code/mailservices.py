@@ -1,4 +1,8 @@
+import queue
 import smtplib
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
@@ -8,21 +12,113 @@ SMTP_PORT = 1025  # Common SMTP port for TLS
 SENDER_EMAIL = 'guhank@study.iitm.ac.in'
 SENDER_PASSWORD = ''  # Replace with your actual password if required
 
+# Connection pool settings
+SMTP_POOL_SIZE = 4  # Maximum open connections per process
+SMTP_MESSAGES_PER_SESSION = 100  # Recycle a connection after this many messages
+SMTP_TIMEOUT = 10
+SMTP_SEND_ATTEMPTS = 2  # First try plus one retry on a fresh connection
+
+# permanent: the server refused the recipient, so sending again will not help.
+SendResult = namedtuple('SendResult', ['to_email', 'ok', 'error', 'attempts', 'permanent'], defaults=(False,))
+
+
+def build_message(to_email, subject, html_content):
+    msg = MIMEMultipart()
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg["From"] = SENDER_EMAIL
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+class SMTPPool:
+    # Bounded pool of open SMTP sessions. Idle connections are reused, so a
+    # run over many recipients pays the TCP + EHLO handshake once per session
+    # instead of once per message.
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, size=SMTP_POOL_SIZE,
+                 messages_per_session=SMTP_MESSAGES_PER_SESSION, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.messages_per_session = messages_per_session
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        client = smtplib.SMTP(host=self.host, port=self.port, timeout=self.timeout)
+        if SENDER_PASSWORD:
+            client.login(SENDER_EMAIL, SENDER_PASSWORD)
+        client.messages_sent = 0
+        return client
+
+    @staticmethod
+    def _close(client):
+        try:
+            client.quit()
+        except Exception:
+            client.close()
+
+    @contextmanager
+    def connection(self, fresh=False):
+        # Blocks while `size` connections are checked out. fresh=True skips
+        # idle connections, which may have been dropped by the server.
+        self._slots.acquire()
+        try:
+            try:
+                if fresh:
+                    raise queue.Empty
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                client = self._connect()
+            try:
+                yield client
+            except Exception:
+                # The session may be in an unknown state; drop it.
+                client.close()
+                raise
+            if client.messages_sent >= self.messages_per_session:
+                self._close(client)
+            else:
+                self._idle.put(client)
+        finally:
+            self._slots.release()
+
+    def send(self, to_email, subject, html_content):
+        msg = build_message(to_email, subject, html_content)
+        error = None
+        for attempt in range(1, SMTP_SEND_ATTEMPTS + 1):
+            try:
+                with self.connection(fresh=attempt > 1) as client:
+                    client.send_message(msg)
+                    client.messages_sent += 1
+                return SendResult(to_email, True, None, attempt)
+            except smtplib.SMTPRecipientsRefused as e:
+                # Retrying on another connection will not change the answer.
+                return SendResult(to_email, False, str(e), attempt, permanent=True)
+            except (smtplib.SMTPException, OSError) as e:
+                error = str(e)
+        return SendResult(to_email, False, error, SMTP_SEND_ATTEMPTS)
+
+    def send_many(self, messages):
+        # messages: iterable of (to_email, subject, html_content).
+        # Yields one SendResult per message, in order.
+        for to_email, subject, html_content in messages:
+            yield self.send(to_email, subject, html_content)
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+smtp_pool = SMTPPool()
+
+
 def send_test_email(to_email, subject, html_content):
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg["To"] = to_email
-        msg["Subject"] = subject
-        msg["From"] = SENDER_EMAIL
-        
-        # Attach HTML content
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        # Connect and send
-        with smtplib.SMTP(host=SMTP_HOST, port=SMTP_PORT) as client:
-            client.send_message(msg)
-        print("Email sent successfully!")
-        
-    except Exception as e:
-        print(f"Failed to send email: {e}")
\ No newline at end of file
+    result = smtp_pool.send(to_email, subject, html_content)
+    if not result.ok:
+        print(f"Failed to send email to {to_email}: {result.error}")
+    return result
@@ -1,30 +1,58 @@
-from flask import Flask, jsonify, request, render_template,send_file
+import csv
+import json
+import os
+import time
+from flask import Flask, jsonify, request, render_template,send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from models import db, User, Admin, Customer, Professional, Service, ServiceRequest
+from sqlalchemy.exc import IntegrityError
+from database import configure_database
+from accounts import ROLES, BULK_REGISTER_MAX_ROWS, create_user, duplicate_field, read_bulk_rows, bulk_register
+from models import db, User, Professional, Service, ServiceRequest, AvailabilitySlot
+from queries import service_request_rows, service_request_columns
+from pagination import Page, PaginationError
+from search import search_services as search_services_index, search_professionals as search_professionals_index
+from suggest import suggestions, SUGGEST_LIMIT, SUGGEST_MAX_LIMIT
+from exports import ExportRegistry, data_fingerprint, export_path
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from passwords import HashingBusy, hash_password, needs_rehash, verify_password
+from datetime import datetime, timedelta
 from celery import Celery
 from worker import celery_init_app
 import logging
 from celery.result import AsyncResult
 import flask_excel as excel
-from tasks import download_csv,daily_remainder,check_pending_service_requests,generate_and_send_monthly_report
+from tasks import download_csv,daily_remainder,check_pending_service_requests,generate_and_send_monthly_report,reconcile_request_counters,roll_up_daily_customer_activity,drain_email_outbox,purge_email_outbox
 from celery.schedules import crontab
 from smtplib import SMTP
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from mailservices import send_test_email
-from flask_caching import Cache
+from caching import cache, cached_response, invalidate
+from identity import identity_claims, identity_cache, role_id
+from profiling import init_profiling
+from counters import snapshot, status_counts, total_counts, track
+from status_updates import BULK_STATUS_MAX_ITEMS, RESULT_RESPONSES, apply_status_actions
+from schedule import (AVAILABILITY_MAX_DAYS, BLOCKING_STATUSES, BOOKING_DEFAULT_MINUTES, SLOT_MAX_HOURS, BookingConflict,
+                      booked_in_database, booking_minutes, parse_when, reserve, schedules, slot_overlap_in_database)
+from rollups import (ANALYTICS_DEFAULT_DAYS, ANALYTICS_MAX_DAYS, ANALYTICS_LIMIT, ANALYTICS_MAX_LIMIT,
+                     activity_by_customer, activity_by_day, rolled_up_through)
+from matching import MATCH_LIMIT, MATCH_MAX_LIMIT, free_on, location_key, matches
+from outbox import OUTBOX_POLL_SECONDS, notify_new_request, outbox_status
+from uuid import uuid4
 app = Flask(__name__)
 app.config["JWT_SECRET_KEY"] = "abcde"
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.sqlite3"
+configure_database(app)
 app.config['CACHE_TYPE'] = 'simple'
 db.init_app(app)
 jwt = JWTManager(app)
+
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    return identity_cache.is_revoked(jwt_payload['sub'])
+
 celery_app=celery_init_app(app)
 excel.init_excel(app)
-cache = Cache(app, config={
+cache.init_app(app, config={
     'CACHE_TYPE': 'redis',
     'CACHE_REDIS_URL': 'redis://localhost:6379/0',
     'CACHE_OPTIONS': {
@@ -32,6 +60,13 @@ cache = Cache(app, config={
         'socket_timeout': 5
     }
 })
+init_profiling(app)
+export_registry = ExportRegistry(cache)
+RESPONSE_CACHE_TIMEOUT = 300  # entries are invalidated by tag on writes
+DATE_FORMATTERS = {'request_date': lambda d: d.strftime('%Y-%m-%d')}
+
+with app.app_context():
+    suggestions.rebuild()
 
 @celery_app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
@@ -43,6 +78,22 @@ def setup_periodic_tasks(sender, **kwargs):
         crontab(hour=9, minute=50, day_of_month=1),
         generate_and_send_monthly_report.s(),
     )
+    sender.add_periodic_task(
+        crontab(hour=3, minute=30),
+        reconcile_request_counters.s(),
+    )
+    sender.add_periodic_task(
+        crontab(hour=1, minute=15),
+        roll_up_daily_customer_activity.s(),
+    )
+    sender.add_periodic_task(
+        OUTBOX_POLL_SECONDS,
+        drain_email_outbox.s(),
+    )
+    sender.add_periodic_task(
+        crontab(hour=2, minute=45),
+        purge_email_outbox.s(),
+    )
 
 
 
@@ -59,44 +110,57 @@ def register():
         if not user_name or not password or not email_id or not name or not role:
             return jsonify({"msg": "Missing fields"}), 400
 
-        hashed_password = generate_password_hash(password)
-
-        if User.query.filter_by(email_id=email_id).first():
-            return jsonify({"msg": "Email already exists"}), 400
-
-        if User.query.filter_by(user_name=user_name).first():
-            return jsonify({"msg": "Username already exists"}), 400
-        
-        if role not in ['admin', 'customer', 'professional']:
+        if role not in ROLES:
             return jsonify({"msg": "Invalid role"}), 400
 
-        new_user = User(
-            name=name,
-            user_name=user_name,
-            email_id=email_id,
-            password=hashed_password,
-            role=role
-        )
-        db.session.add(new_user)
-        db.session.commit()
-
-        if role == 'admin':
-            new_admin = Admin(user_id=new_user.user_id)
-            db.session.add(new_admin)
-        elif role == 'customer':
-            new_customer = Customer(user_id=new_user.user_id)
-            db.session.add(new_customer)
-        elif role == 'professional':
-            new_professional = Professional(user_id=new_user.user_id)
-            db.session.add(new_professional)
-        db.session.commit()
+        # One transaction for the user and its role row; the unique
+        # constraints on user_name and email_id reject duplicates.
+        try:
+            create_user(user_name, password, email_id, name, role)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            field = duplicate_field(e)
+            if field == 'email_id':
+                return jsonify({"msg": "Email already exists"}), 400
+            if field == 'user_name':
+                return jsonify({"msg": "Username already exists"}), 400
+            raise
+        invalidate('users', 'professionals')
 
         return jsonify({"msg": "Registration successful!"}), 201
+    except HashingBusy:
+        db.session.rollback()
+        return jsonify({"msg": "Server busy, please try again"}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({"msg": "An error occurred during registration", "error": str(e)}), 500
 
+@app.route('/admin/bulk_register', methods=['POST'])
+@jwt_required()
+def bulk_register_users():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({"msg": "Access forbidden"}), 403
+
+    try:
+        rows = read_bulk_rows(request)
+    except (ValueError, csv.Error) as e:
+        return jsonify({"msg": str(e)}), 400
+    if not rows:
+        return jsonify({"msg": "No users in upload"}), 400
+    if len(rows) > BULK_REGISTER_MAX_ROWS:
+        return jsonify({"msg": f"At most {BULK_REGISTER_MAX_ROWS} users per upload"}), 400
+
+    try:
+        created, errors = bulk_register(rows)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "Some users were registered while this upload ran; nothing was imported, please retry"}), 409
+    if created:
+        invalidate('users', 'professionals')
+    return jsonify({"created": created, "errors": errors}), 201 if created else 400
+
 @app.route('/login', methods=['POST'])
-@cache.cached(timeout=50)
 def login():
     try:
         data = request.get_json()
@@ -112,11 +176,18 @@ def login():
         if user.is_blocked:
             return jsonify({"msg": "User is blocked"}), 403
 
-        if not check_password_hash(user.password, password):
+        if not verify_password(user.password, password):
             return jsonify({"msg": "Incorrect password"}), 401
+        if needs_rehash(user.password):
+            # Made with an older method or work factor; upgrade it now that
+            # the plain password is at hand.
+            user.password = hash_password(password)
+            db.session.commit()
 
-        access_token = create_access_token(identity={"user_id": user.user_id, "role": user.role})
+        access_token = create_access_token(identity=identity_claims(user))
         return jsonify({"msg": "Login successful", "access_token": access_token}), 200
+    except HashingBusy:
+        return jsonify({"msg": "Server busy, please try again"}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({"msg": "An error occurred during login", "error": str(e)}), 500
     print(f"Caching to Redis: {cache.config['CACHE_REDIS_URL']}") 
@@ -125,23 +196,26 @@ def login():
 def home():
     return render_template('index.html')
 @app.route('/admin/view_users', methods=['GET'])
-@cache.cached(timeout=10)
 @jwt_required()
+@cached_response(timeout=RESPONSE_CACHE_TIMEOUT, tags=['users'], vary='role')
 def list_users():
     current_user = get_jwt_identity()
-    user = User.query.filter_by(user_id=current_user['user_id']).first()
 
-    if user.role != 'admin':
+    if current_user['role'] != 'admin':
         return jsonify({"msg": "Access forbidden: Only admins can view the user list"}), 403
 
-    users = User.query.filter(User.role != 'admin').all()
-    user_list = [{
-        'user_id': u.user_id,
-        'user_name': u.user_name,
-        'role': u.role,
-        'is_blocked': u.is_blocked
-    } for u in users]
-    return jsonify(user_list), 200
+    try:
+        page = Page.from_request({
+            'user_id': User.user_id,
+            'user_name': User.user_name,
+            'role': User.role,
+            'is_blocked': User.is_blocked,
+        }, key='user_id')
+    except PaginationError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    users = db.session.execute(page.select().where(User.role != 'admin')).all()
+    return jsonify(page.response(users)), 200
 @app.route('/admin/approve_professionals', methods=['POST', 'GET'])
 @jwt_required()
 def approve_professionals():
@@ -180,30 +254,35 @@ def approve_professionals():
         # Update the approval status
         professional.approved = True
         db.session.commit()
+        invalidate('professionals')
+        matches.touch(professional.professional_id)
+        if not professional.user.is_blocked:
+            suggestions.add('professional', professional.professional_id, professional.user.name)
 
         return jsonify({"msg": "Professional approved successfully"}), 200
 @app.route('/admin/users', methods=['GET'])
 @jwt_required()
 def manage_users():
     current_user = get_jwt_identity()
-    print(current_user)
     if current_user['role'] != 'admin':
         return jsonify({"msg": "Access forbidden"}), 403
     
-    users = User.query.filter(
+    try:
+        page = Page.from_request({
+            'user_id': User.user_id,
+            'name': User.name,
+            'user_name': User.user_name,
+            'email_id': User.email_id,
+            'role': User.role,
+        }, key='user_id')
+    except PaginationError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    users = db.session.execute(page.select().where(
         ((User.role == 'customer') | (User.role == 'professional')) & 
         (User.is_blocked == False)
-    ).all()
-    user_list = [
-        {
-            'user_id': user.user_id,
-            'name': user.name,
-            'user_name': user.user_name,
-            'email_id': user.email_id,
-            'role': user.role,
-        } for user in users
-    ]
-    return jsonify(user_list), 200
+    )).all()
+    return jsonify(page.response(users)), 200
 
 @app.route('/admin/block_users', methods=['POST'])
 @jwt_required()
@@ -223,6 +302,11 @@ def block_users():
     
     user.is_blocked = True
     db.session.commit()
+    invalidate('users', 'professionals')
+    identity_cache.revoke(user.user_id)
+    for professional in Professional.query.filter_by(user_id=user.user_id):
+        suggestions.remove('professional', professional.professional_id)
+        matches.touch(professional.professional_id)
     return jsonify({"msg": "User blocked successfully"}), 200
 @app.route('/admin/create_service', methods=['POST'])
 @jwt_required()
@@ -244,6 +328,8 @@ def create_service():
     new_service = Service(name=name, price=price, location=location, description=description)
     db.session.add(new_service)
     db.session.commit()
+    invalidate('services')
+    suggestions.add('service', new_service.service_id, new_service.name)
     
     return jsonify({"msg": "Service created successfully"}), 201
 @app.route('/admin/manage_services', methods=['GET', 'PUT', 'DELETE'])
@@ -254,17 +340,19 @@ def manage_services():
         return jsonify({"msg": "Access forbidden"}), 403
 
     if request.method == 'GET':
-        services = Service.query.all()
-        service_list = [
-            {
-                'service_id': service.service_id,
-                'name': service.name,
-                'price': service.price,
-                'location': service.location,
-                'description': service.description,
-            } for service in services
-        ]
-        return jsonify(service_list), 200
+        try:
+            page = Page.from_request({
+                'service_id': Service.service_id,
+                'name': Service.name,
+                'price': Service.price,
+                'location': Service.location,
+                'description': Service.description,
+            }, key='service_id')
+        except PaginationError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        services = db.session.execute(page.select()).all()
+        return jsonify(page.response(services)), 200
 
     elif request.method == 'PUT':
         data = request.get_json()
@@ -282,10 +370,13 @@ def manage_services():
             service.price = data['price']
         if 'location' in data:
             service.location = data['location']
+            matches.expire()
         if 'description' in data:
             service.description = data['description']
         
         db.session.commit()
+        invalidate('services')
+        suggestions.add('service', service.service_id, service.name)
         return jsonify({"msg": "Service updated successfully"}), 200
 
     elif request.method == 'DELETE':
@@ -300,10 +391,12 @@ def manage_services():
         
         db.session.delete(service)
         db.session.commit()
+        invalidate('services')
+        suggestions.remove('service', service_id)
         return jsonify({"msg": "Service deleted successfully"}), 200
 @app.route('/customer/view_professionals', methods=['GET'])
-@cache.cached(timeout=10)
 @jwt_required()
+@cached_response(timeout=RESPONSE_CACHE_TIMEOUT, tags=['professionals'])
 def view_professionals():
     professionals = Professional.query.all()
     result = []
@@ -314,28 +407,60 @@ def view_professionals():
         }
         result.append(professional_data)
     return jsonify(result)
+@app.route('/customer/match_professionals', methods=['GET'])
+@jwt_required()
+def match_professionals():
+    # ?service_id=&date=YYYY-MM-DD[&location=][&duration_minutes=][&limit=]:
+    # the best approved, unblocked professionals free on that date, for the
+    # service's location unless another is given (see matching.py).
+    try:
+        service_id = int(request.args['service_id'])
+        day = datetime.strptime(request.args.get('date') or datetime.today().strftime('%Y-%m-%d'), '%Y-%m-%d').date()
+        minutes = booking_minutes(request.args.get('duration_minutes', BOOKING_DEFAULT_MINUTES))
+        limit = int(request.args.get('limit', MATCH_LIMIT))
+    except KeyError:
+        return jsonify({"msg": "service_id is required"}), 400
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    if not 1 <= limit <= MATCH_MAX_LIMIT:
+        return jsonify({"msg": f"limit must be between 1 and {MATCH_MAX_LIMIT}"}), 400
+    service = db.session.get(Service, service_id)
+    if not service:
+        return jsonify({"msg": "Service not found"}), 404
+    location = request.args.get('location') or service.location
+
+    matches.refresh()
+    ranked = matches.rank(location, limit, available=free_on(day, minutes))
+    return jsonify({
+        'service_id': service_id,
+        'location': location,
+        'date': day.isoformat(),
+        'items': [{
+            'professional_id': professional_id,
+            'name': features.name,
+            'score': round(score, 4),
+            'open_requests': features.open,
+            'completion_rate': round(features.completion_rate(), 4),
+            'location_share': round(features.location_share(location_key(location)), 4),
+        } for professional_id, score, features in ranked],
+    }), 200
 @app.route('/customer/create_service_request', methods=['POST','GET']) 
 @jwt_required()
 def create_service_request():
     try:
         current_user = get_jwt_identity()
-        print("Current user:", current_user)
         
         if current_user['role'] != 'customer':
             return jsonify({"msg": "Access forbidden"}), 403
         
         data = request.get_json()
-        print("Request data:", data)
+        app.logger.debug(f"create_service_request by {current_user['user_id']}: {data}")
         if not data or 'service_id' not in data or 'professional_id' not in data or 'request_date' not in data:
             return jsonify({"msg": "Missing required fields"}), 400
         
         service_id = data['service_id']
         professional_id = data['professional_id']
         request_date = data['request_date']
-
-        print("Service ID:", service_id)
-        print("Professional ID:", professional_id) 
-        print("Request Date:", request_date)
         
         # Validate the service
         service = Service.query.get(service_id)
@@ -348,31 +473,49 @@ def create_service_request():
             return jsonify({"msg": "Professional not found"}), 404
         
         # Validate the customer
-        customer = Customer.query.filter_by(user_id=current_user['user_id']).first() 
-        app.logger.info(f"Customer object fetched: {customer}")
-        if not customer:
+        customer_id = role_id(current_user, 'customer')
+        if customer_id is None:
             return jsonify({"msg": "Customer not found"}), 404
-        request_date = datetime.strptime(data['request_date'], '%Y-%m-%d')
-        
+        try:
+            request_date, has_time = parse_when(data['request_date'])
+            minutes = booking_minutes(data.get('duration_minutes', BOOKING_DEFAULT_MINUTES))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        # Professionals with published availability are booked into a free
+        # interval; the rest by day, as before.
+        try:
+            request_date, scheduled_end = reserve(professional.professional_id, request_date, has_time, minutes)
+        except BookingConflict as e:
+            db.session.rollback()
+            return jsonify({"msg": str(e)}), 409
         
         # Create a new service request
         new_request = ServiceRequest(
             service_id=service_id,
-            professional_id=professional_id,
-            customer_id=customer.customer_id,
+            professional_id=professional.professional_id,
+            customer_id=customer_id,
             request_date=request_date,
+            scheduled_end=scheduled_end,
             status='Pending'
         )
         db.session.add(new_request)
+        track(None, snapshot(new_request))
+        db.session.flush()
+        notify_new_request(new_request, professional, service)
         db.session.commit()
+        schedules.sync(new_request)
+        matches.touch(new_request.professional_id)
         
         return jsonify({
             "msg": "Service request created successfully",
             "service_request": {
+                "servicerequest_id": new_request.servicerequest_id,
                 "service_id": new_request.service_id,
                 "professional_id": new_request.professional_id,
                 "customer_id": new_request.customer_id,
                 "request_date": new_request.request_date,
+                "scheduled_end": new_request.scheduled_end,
                 "status": new_request.status
             }
         }), 201
@@ -383,21 +526,20 @@ def create_service_request():
 
   
 @app.route('/customer/view_services', methods=['GET'])
-@cache.cached(timeout=10)
 @jwt_required()
+@cached_response(timeout=RESPONSE_CACHE_TIMEOUT, tags=['services'])
 def get_services():
     try:
-        services = Service.query.all()
-        service_list = [
-            {
-                'service_id': service.service_id,
-                'name': service.name,
-                'description': service.description,
-                'price': service.price
-         
-            } for service in services
-        ]
-        return jsonify(service_list), 200
+        page = Page.from_request({
+            'service_id': Service.service_id,
+            'name': Service.name,
+            'description': Service.description,
+            'price': Service.price,
+        }, key='service_id')
+        services = db.session.execute(page.select()).all()
+        return jsonify(page.response(services)), 200
+    except PaginationError as e:
+        return jsonify({"msg": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error in get_services: {str(e)}")
         return jsonify({"msg": f"Server error: {str(e)}"}), 500
@@ -406,37 +548,30 @@ def get_services():
 def manage_service_requests():
     try:
         current_user = get_jwt_identity()
-        app.logger.info(f"Current user: {current_user}")
+        app.logger.debug(f"Current user: {current_user}")
         
         if current_user['role'] != 'customer':
             return jsonify({"msg": "Access forbidden"}), 403
 
-        customer = Customer.query.filter_by(user_id=current_user['user_id']).first()
-        app.logger.info(f"Customer: {customer}")
-        
-        if not customer:
+        customer_id = role_id(current_user, 'customer')
+        if customer_id is None:
             return jsonify({"msg": "Customer not found"}), 404
 
         if request.method == 'GET':
-            service_requests = ServiceRequest.query.filter_by(customer_id=customer.customer_id).all()
-            app.logger.info(f"Service requests: {service_requests}")
-            
-            request_list = [
-                {
-                    'servicerequest_id': req.servicerequest_id,
-                    'service_id': req.service_id,
-                    'professional_id': req.professional_id,
-                    'request_date': req.request_date.strftime('%Y-%m-%d'),
-                    'status': req.status,
-                    'service_name': req.service.name,
-                    'professional_name': req.professional.user.name
-                } for req in service_requests
-            ]
-            return jsonify(request_list), 200
+            try:
+                page = Page.from_request(service_request_columns(
+                    'servicerequest_id', 'service_id', 'professional_id', 'request_date',
+                    'status', 'service_name', 'professional_name',
+                ), key='servicerequest_id')
+            except PaginationError as e:
+                return jsonify({"msg": str(e)}), 400
+
+            service_requests = service_request_rows(page, customer_id=customer_id)
+            return jsonify(page.response(service_requests, formatters=DATE_FORMATTERS)), 200
 
         elif request.method == 'PUT':
             data = request.get_json()
-            app.logger.info(f"PUT data: {data}")
+            app.logger.debug(f"PUT data: {data}")
 
             if not data or 'servicerequest_id' not in data:
                 return jsonify({"msg": "Missing servicerequest_id"}), 422
@@ -445,8 +580,16 @@ def manage_service_requests():
             if not service_request:
                 return jsonify({"msg": "Service request not found"}), 404
 
-            if service_request.customer_id != customer.customer_id:
+            if service_request.customer_id != customer_id:
                 return jsonify({"msg": "Access forbidden"}), 403
+            before = snapshot(service_request)
+            # Moving the booking (new time, length or professional) or
+            # reopening it has to find room in the professional's schedule.
+            held_time = service_request.status in BLOCKING_STATUSES
+            has_time = service_request.scheduled_end is not None
+            minutes = (int((service_request.scheduled_end - service_request.request_date).total_seconds() // 60)
+                       if has_time else BOOKING_DEFAULT_MINUTES)
+            reschedule = False
 
             if 'service_name' in data:
                 service = Service.query.filter_by(name=data['service_name']).first()
@@ -458,20 +601,39 @@ def manage_service_requests():
                 professional = Professional.query.join(User).filter(User.name == data['professional_name'], Professional.user_id == User.user_id).first()
                 if not professional:
                     return jsonify({"msg": "Professional not found"}), 404
+                reschedule = reschedule or professional.professional_id != service_request.professional_id
                 service_request.professional_id = professional.professional_id
 
-            if 'request_date' in data:
-                service_request.request_date = datetime.strptime(data['request_date'], '%Y-%m-%d')
+            try:
+                if 'request_date' in data:
+                    service_request.request_date, has_time = parse_when(data['request_date'])
+                    reschedule = True
+                if 'duration_minutes' in data:
+                    minutes = booking_minutes(data['duration_minutes'])
+                    reschedule = True
+            except ValueError as e:
+                return jsonify({"msg": str(e)}), 400
             if 'status' in data:
                 service_request.status = data['status']
 
+            if service_request.status in BLOCKING_STATUSES and (reschedule or not held_time):
+                try:
+                    service_request.request_date, service_request.scheduled_end = reserve(
+                        service_request.professional_id, service_request.request_date, has_time, minutes,
+                        exclude=service_request.servicerequest_id)
+                except BookingConflict as e:
+                    db.session.rollback()
+                    return jsonify({"msg": str(e)}), 409
+
+            track(before, snapshot(service_request))
             db.session.commit()
+            schedules.sync(service_request)
+            matches.touch(before[1], service_request.professional_id)  # old and new professional
             return jsonify({"msg": "Service request updated successfully"}), 200
 
         elif request.method == 'DELETE':
             data = request.get_json()
-            print("this", data)
-            app.logger.info(f"DELETE data: {data}")
+            app.logger.debug(f"DELETE data: {data}")
 
             if not data or 'servicerequest_id' not in data:
                 return jsonify({"msg": "Missing servicerequest_id"}), 422
@@ -480,19 +642,22 @@ def manage_service_requests():
             if not service_request:
                 return jsonify({"msg": "Service request not found"}), 404
 
-            if service_request.customer_id != customer.customer_id:
+            if service_request.customer_id != customer_id:
                 return jsonify({"msg": "Access forbidden"}), 403
 
+            track(snapshot(service_request), None)
             db.session.delete(service_request)
             db.session.commit()
+            schedules.release(service_request.servicerequest_id)
+            matches.touch(service_request.professional_id)
             return jsonify({"msg": "Service request deleted successfully"}), 200
 
     except Exception as e:
         app.logger.error(f"Error in manage_service_requests: {str(e)}")
         return jsonify({"msg": f"Server error: {str(e)}"}), 500
 @app.route('/professional/view_services', methods=['GET'])
-@cache.cached(timeout=10)
 @jwt_required()
+@cached_response(timeout=RESPONSE_CACHE_TIMEOUT, tags=['services'])
 def get_services_prof():
     try:
         services = Service.query.all()
@@ -509,6 +674,85 @@ def get_services_prof():
     except Exception as e:
         app.logger.error(f"Error in get_services: {str(e)}")
         return jsonify({"msg": f"Server error: {str(e)}"}), 500
+@app.route('/admin/summary', methods=['GET'])
+@app.route('/customer/summary', methods=['GET'])
+@app.route('/professional/summary', methods=['GET'])
+@jwt_required()
+def request_summary():
+    # Service request counts per status for the dashboards, read from the
+    # maintained counters rather than the service_requests rows.
+    current_user = get_jwt_identity()
+    role = request.path.split('/')[1]
+    if current_user['role'] != role:
+        return jsonify({"msg": "Access forbidden"}), 403
+    if role == 'admin':
+        return jsonify({'counts': total_counts()}), 200
+    owner_id = role_id(current_user, role)
+    if owner_id is None:
+        return jsonify({"msg": f"{role.capitalize()} not found"}), 404
+    return jsonify({'counts': status_counts(role, owner_id)}), 200
+@app.route('/admin/email_outbox', methods=['GET'])
+@jwt_required()
+def email_outbox_status():
+    # Delivery state of queued emails: rows per status, how long the oldest
+    # due email has waited and the latest permanent failures.
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({"msg": "Access forbidden"}), 403
+    counts, oldest_due, failed = outbox_status()
+    return jsonify({
+        'counts': counts,
+        'oldest_due': oldest_due.isoformat(timespec='seconds') if oldest_due else None,
+        'failed': [{
+            'outbox_id': row.outbox_id,
+            'kind': row.kind,
+            'to_email': row.to_email,
+            'attempts': row.attempts,
+            'last_error': row.last_error,
+            'created_at': row.created_at.isoformat(timespec='seconds'),
+        } for row in failed],
+    }), 200
+@app.route('/admin/analytics/customer_activity', methods=['GET'])
+@jwt_required()
+def customer_activity_analytics():
+    # Customer activity from the nightly daily_customer_activity rollup:
+    # totals per day (optionally for one customer_id), or per customer with
+    # group=customer. start is inclusive and end exclusive, as YYYY-MM-DD.
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({"msg": "Access forbidden"}), 403
+
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else datetime.today().date()
+        start = (datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start')
+                 else end - timedelta(days=ANALYTICS_DEFAULT_DAYS))
+        customer_id = int(request.args['customer_id']) if request.args.get('customer_id') else None
+        limit = int(request.args.get('limit', ANALYTICS_LIMIT))
+    except ValueError:
+        return jsonify({"msg": "start and end must be YYYY-MM-DD; customer_id and limit must be integers"}), 400
+    if not start < end:
+        return jsonify({"msg": "start must be before end"}), 400
+    if (end - start).days > ANALYTICS_MAX_DAYS:
+        return jsonify({"msg": f"At most {ANALYTICS_MAX_DAYS} days per query"}), 400
+    if not 1 <= limit <= ANALYTICS_MAX_LIMIT:
+        return jsonify({"msg": f"limit must be between 1 and {ANALYTICS_MAX_LIMIT}"}), 400
+
+    group = request.args.get('group', 'day')
+    if group == 'day':
+        items = [dict(row._asdict(), day=row.day.isoformat()) for row in activity_by_day(start, end, customer_id)]
+    elif group == 'customer':
+        items = [row._asdict() for row in activity_by_customer(start, end, limit)]
+    else:
+        return jsonify({"msg": "group must be day or customer"}), 400
+
+    through = rolled_up_through()
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group': group,
+        'rolled_up_through': through.isoformat() if through else None,
+        'items': items,
+    }), 200
 @app.route('/professional/service_requests', methods=['GET']) 
 @jwt_required()
 def get_all_service_requests():
@@ -517,22 +761,19 @@ def get_all_service_requests():
     if current_user['role'] != 'professional':
         return jsonify({"msg": "Access forbidden"}), 403
 
-    professional = Professional.query.filter_by(user_id=current_user['user_id']).first()
-    if not professional:
+    professional_id = role_id(current_user, 'professional')
+    if professional_id is None:
         return jsonify({"msg": "Professional not found"}), 404
 
-    service_requests = ServiceRequest.query.filter_by(professional_id=professional.professional_id).all()
-    request_list = [
-        {
-            'servicerequest_id': req.servicerequest_id,
-            'service_name': Service.query.get(req.service_id).name,
-            'customer_name': Customer.query.get(req.customer_id).user.name,
-            'request_date': req.request_date.strftime('%Y-%m-%d'),
-            'status': req.status
-        } for req in service_requests
-    ]
-
-    return jsonify(request_list), 200
+    try:
+        page = Page.from_request(service_request_columns(
+            'servicerequest_id', 'service_name', 'customer_name', 'request_date', 'status',
+        ), key='servicerequest_id')
+    except PaginationError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    service_requests = service_request_rows(page, professional_id=professional_id)
+    return jsonify(page.response(service_requests, formatters=DATE_FORMATTERS)), 200
 @app.route('/professional/service_requests/update_status', methods=['POST'])
 @jwt_required()
 def update_service_request_status():
@@ -546,47 +787,70 @@ def update_service_request_status():
         action = req_data.get('action')
 
         # Log the received data for debugging
-        app.logger.info(f"Received data: servicerequest_id={service_request_id}, action={action}")
-
-        service_request = ServiceRequest.query.filter_by(servicerequest_id=service_request_id).first()
-
-        if not service_request:
-            return jsonify({"msg": "Service request not found"}), 404
+        app.logger.debug(f"Received data: servicerequest_id={service_request_id}, action={action}")
 
-        if action == 'accept':
-            service_request.status = 'Accepted'
-        elif action == 'reject':
-            service_request.status = 'Rejected'
-        elif action == 'close':
-            service_request.status = 'Closed'
-        else:
-            return jsonify({"msg": "Invalid action"}), 400
+        professional_id = role_id(current_user, 'professional')
+        if professional_id is None:
+            return jsonify({"msg": "Professional not found"}), 404
 
+        result = apply_status_actions(professional_id, [(service_request_id, action)])[0]
+        if result['result'] != 'updated':
+            db.session.rollback()
+            status_code, msg = RESULT_RESPONSES[result['result']]
+            return jsonify({"msg": msg, **result}), status_code
         db.session.commit()
+        matches.touch(professional_id)
+        if result['status'] not in BLOCKING_STATUSES:
+            schedules.release(service_request_id)
         return jsonify({"msg": f"Service request {action}ed successfully"}), 200
     except Exception as e:
         # Log the exception for debugging
         app.logger.error(f"Error updating service request status: {e}")
         return jsonify({"msg": "Internal Server Error"}), 500
+
+@app.route('/professional/service_requests/bulk_update_status', methods=['POST'])
+@jwt_required()
+def bulk_update_service_request_status():
+    # {"items": [{"servicerequest_id": 1, "action": "accept"}, ...]}. Items
+    # that can be applied are, in one transaction; the rest are reported per
+    # item in "results" and left unchanged.
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'professional':
+        return jsonify({"msg": "Access forbidden"}), 403
+
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return jsonify({"msg": "items must be a non-empty list of {servicerequest_id, action}"}), 400
+    if len(items) > BULK_STATUS_MAX_ITEMS:
+        return jsonify({"msg": f"At most {BULK_STATUS_MAX_ITEMS} items per request"}), 400
+
+    professional_id = role_id(current_user, 'professional')
+    if professional_id is None:
+        return jsonify({"msg": "Professional not found"}), 404
+
+    try:
+        results = apply_status_actions(professional_id, [(item.get('servicerequest_id'), item.get('action')) for item in items])
+        db.session.commit()
+        matches.touch(professional_id)
+        for result in results:
+            if result['result'] == 'updated' and result['status'] not in BLOCKING_STATUSES:
+                schedules.release(result['servicerequest_id'])
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error in bulk status update: {e}")
+        return jsonify({"msg": "Internal Server Error"}), 500
+    updated = sum(result['result'] == 'updated' for result in results)
+    return jsonify({"updated": updated, "failed": len(results) - updated, "results": results}), 200
 @app.route('/customer/search_services', methods=['GET'])
 @jwt_required()
 def search_services():
     current_user = get_jwt_identity()
-    # Debugging: Print the current user's role
-    print(f"Current User Role: {current_user.get('role')}")
 
     if current_user['role'] != 'customer':
         return jsonify({"msg": "Access forbidden"}), 403
 
-    # Get query parameters
-    name = request.args.get('name')
-
-    query = Service.query
-
-    if name:
-        query = query.filter(Service.name.ilike(f'%{name}%'))
-
-    services = query.all()
+    services = search_services_index(request.args.get('name'))
 
     service_list = [
         {
@@ -605,34 +869,235 @@ def search_professionals():
     if current_user['role'] != 'admin':
         return jsonify({"msg": "Access forbidden"}), 403
 
-    name = request.args.get('name')
-    query = Professional.query.join(User).filter(User.name.ilike(f'%{name}%'))
-
-    professionals = query.all()
+    professionals = search_professionals_index(request.args.get('name'))
 
     professional_list = [
         {
             'professional_id': professional.professional_id,
-            'name': professional.user.name,  # Assuming 'name' is a field in the User model
+            'name': name,
             'is_blocked': professional.approved  # Assuming 'approved' indicates blocked status
-        } for professional in professionals
+        } for professional, name in professionals
     ]
 
     return jsonify(professional_list), 200
+@app.route('/search/suggest', methods=['GET'])
+@jwt_required()
+def search_suggest():
+    # Typeahead for the search boxes; answered from the in-process index.
+    prefix = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', SUGGEST_LIMIT))
+    except ValueError:
+        return jsonify({"msg": "limit must be an integer"}), 400
+    if not 1 <= limit <= SUGGEST_MAX_LIMIT:
+        return jsonify({"msg": f"limit must be between 1 and {SUGGEST_MAX_LIMIT}"}), 400
+    kinds = ('service', 'professional')
+    if request.args.get('type'):
+        if request.args['type'] not in kinds:
+            return jsonify({"msg": "type must be service or professional"}), 400
+        kinds = (request.args['type'],)
+
+    if suggestions.is_stale():
+        suggestions.rebuild()
+    return jsonify({'suggestions': suggestions.suggest(prefix, limit, kinds)}), 200
+def day_range(args, default_days=7):
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD as midnights, end exclusive.
+    start = datetime.strptime(args['start'], '%Y-%m-%d') if args.get('start') else datetime.combine(datetime.today(), datetime.min.time())
+    end = datetime.strptime(args['end'], '%Y-%m-%d') if args.get('end') else start + timedelta(days=default_days)
+    if not start < end:
+        raise ValueError("start must be before end")
+    if (end - start).days > AVAILABILITY_MAX_DAYS:
+        raise ValueError(f"At most {AVAILABILITY_MAX_DAYS} days per query")
+    return start, end
+
+def interval_json(start, end, **extra):
+    return dict(extra, start=start.isoformat(timespec='minutes'), end=end.isoformat(timespec='minutes'))
+
+@app.route('/availability', methods=['GET'])
+@jwt_required()
+def availability():
+    # Free time of one professional in [start, end), from the schedule
+    # index. "scheduled" is false for professionals who have not published
+    # availability and are booked by day.
+    try:
+        professional_id = int(request.args['professional_id'])
+        start, end = day_range(request.args)
+    except KeyError:
+        return jsonify({"msg": "professional_id is required"}), 400
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    schedules.refresh()
+    return jsonify({
+        'professional_id': professional_id,
+        'scheduled': schedules.is_scheduled(professional_id),
+        'start': start.date().isoformat(),
+        'end': end.date().isoformat(),
+        'free': [interval_json(free_start, free_end) for free_start, free_end in schedules.free(professional_id, start, end)],
+    }), 200
+
+@app.route('/professional/availability', methods=['GET', 'POST', 'DELETE'])
+@jwt_required()
+def professional_availability():
+    # A professional's published slots: list them for a date range, publish
+    # new ones ({"slots": [{"start": "2024-06-01T09:00", "end": "2024-06-01T17:00"}]})
+    # or withdraw one ({"slot_id": 1}) that no booking falls in.
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'professional':
+        return jsonify({"msg": "Access forbidden"}), 403
+    professional_id = role_id(current_user, 'professional')
+    if professional_id is None:
+        return jsonify({"msg": "Professional not found"}), 404
+    schedules.refresh()
+
+    if request.method == 'GET':
+        try:
+            start, end = day_range(request.args)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        return jsonify({'slots': [interval_json(slot_start, slot_end, slot_id=slot_id)
+                                  for slot_start, slot_end, slot_id in schedules.slots(professional_id, start, end)]}), 200
+
+    data = request.get_json(silent=True) or {}
+    if request.method == 'POST':
+        slots = data.get('slots')
+        if not isinstance(slots, list) or not slots or not all(isinstance(slot, dict) for slot in slots):
+            return jsonify({"msg": "slots must be a non-empty list of {start, end}"}), 400
+        intervals = []
+        for slot in slots:
+            try:
+                (start, start_has_time), (end, end_has_time) = parse_when(slot.get('start')), parse_when(slot.get('end'))
+            except ValueError as e:
+                return jsonify({"msg": str(e)}), 400
+            if not (start_has_time and end_has_time and start < end <= start + timedelta(hours=SLOT_MAX_HOURS)):
+                return jsonify({"msg": f"Each slot needs a start and end time, at most {SLOT_MAX_HOURS} hours apart", "slot": slot}), 400
+            intervals.append((start, end))
+        intervals.sort()
+        for (start, end), following in zip(intervals, intervals[1:] + [None]):
+            if (following and following[0] < end) or schedules.slot_overlaps(professional_id, start, end):
+                return jsonify({"msg": "Slot overlaps another published slot", "slot": interval_json(start, end)}), 409
+        # Slots published since this process last read them.
+        overlap = slot_overlap_in_database(professional_id, intervals)
+        if overlap:
+            db.session.rollback()
+            return jsonify({"msg": "Slot overlaps another published slot", "slot": interval_json(*overlap)}), 409
+
+        rows = [AvailabilitySlot(professional_id=professional_id, starts_at=start, ends_at=end) for start, end in intervals]
+        db.session.add_all(rows)
+        db.session.commit()
+        for row in rows:
+            schedules.add_slot(professional_id, row.starts_at, row.ends_at, row.slot_id)
+        return jsonify({'slots': [interval_json(row.starts_at, row.ends_at, slot_id=row.slot_id) for row in rows]}), 201
+
+    slot = db.session.get(AvailabilitySlot, data.get('slot_id')) if data.get('slot_id') else None
+    if not slot:
+        return jsonify({"msg": "Slot not found"}), 404
+    if slot.professional_id != professional_id:
+        return jsonify({"msg": "Access forbidden"}), 403
+    if (schedules.booked(professional_id, slot.starts_at, slot.ends_at)
+            or booked_in_database(professional_id, slot.starts_at, slot.ends_at)):
+        db.session.rollback()
+        return jsonify({"msg": "Bookings fall in this slot; reject or close them first"}), 409
+    db.session.delete(slot)
+    db.session.commit()
+    schedules.remove_slot(professional_id, slot.slot_id)
+    return jsonify({"msg": "Slot withdrawn"}), 200
+
 logging.basicConfig(level=logging.INFO)
 @app.get('/download-csv')
 def download_csv_data():
-    task=download_csv.delay()
-    return jsonify({"task-id":task.id})
+    # Requests for the same data share one export: an in-flight task is
+    # joined and a finished file is reused until service_requests changes.
+    compress = request.args.get('gzip') == '1'
+    fingerprint = data_fingerprint()
+    filename = export_path(f"service_requests_{fingerprint}", compress=compress)
+    task_id = str(uuid4())
+
+    entry = export_registry.claim(fingerprint, compress, task_id, filename)
+    if entry and entry['task_id'] != task_id:
+        if os.path.exists(entry['filename']) or not AsyncResult(entry['task_id']).ready():
+            return jsonify({"task-id": entry['task_id']})
+        # The earlier export failed or its file was evicted; build it again.
+        export_registry.release(fingerprint, compress)
+        entry = export_registry.claim(fingerprint, compress, task_id, filename)
+        if entry and entry['task_id'] != task_id:
+            return jsonify({"task-id": entry['task_id']})
+
+    download_csv.apply_async(kwargs={'compress': compress, 'fingerprint': fingerprint}, task_id=task_id)
+    return jsonify({"task-id": task_id})
 
 @app.get('/get-csv/<task_id>')
 def get_csv(task_id):
-    res = AsyncResult(task_id)
-    if res.ready():
-        filename=res.result
+    filename = export_registry.filename_for_task(task_id)
+    if filename and os.path.exists(filename):
         return send_file(filename, as_attachment=True)
-    else:
+    res = AsyncResult(task_id)
+    if not res.ready():
         return jsonify({"message":"task is pending"}),404
+    # A failed task's result is its exception; a finished export may have
+    # been evicted since. Either way the client asks /download-csv again,
+    # which starts a fresh export.
+    if not res.successful():
+        return jsonify({"message": "The export failed; request a new one from /download-csv"}), 410
+    if not os.path.exists(res.result):
+        return jsonify({"message": "The export has expired; request a new one from /download-csv"}), 410
+    return send_file(res.result, as_attachment=True)
+
+EXPORT_EVENTS_TIMEOUT = 300  # seconds an events stream waits for the export
+EXPORT_EVENTS_KEEPALIVE = 15  # seconds between keep-alive comments
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def export_event(task_id, meta):
+    # Returns (event text, finished) for a task meta dict from the backend.
+    status = meta['status']
+    if status == 'SUCCESS':
+        return sse('ready', {'url': f'/get-csv/{task_id}'}), True
+    if status in ('FAILURE', 'REVOKED'):
+        return sse('failed', {'error': str(meta.get('result'))}), True
+    if status == 'PROGRESS':
+        return sse('progress', meta.get('result') or {}), False
+    return sse('pending', {'status': status}), False
+
+@app.get('/get-csv/<task_id>/events')
+def get_csv_events(task_id):
+    # Server-sent events for an export task: progress while it runs, then one
+    # ready or failed event. Waits on the result backend's pub/sub channel for
+    # the task instead of being polled.
+    def stream():
+        backend = celery_app.backend
+        pubsub = backend.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(backend.get_key_for_task(task_id))
+        try:
+            filename = export_registry.filename_for_task(task_id)
+            if filename and os.path.exists(filename):
+                yield sse('ready', {'url': f'/get-csv/{task_id}'})
+                return
+            # Read the stored state only after subscribing, so a task that
+            # finishes in between is not missed.
+            meta = backend.get_task_meta(task_id)
+            deadline = time.monotonic() + EXPORT_EVENTS_TIMEOUT
+            while True:
+                if meta is not None:
+                    event, finished = export_event(task_id, meta)
+                    yield event
+                    if finished:
+                        return
+                if time.monotonic() > deadline:
+                    yield sse('timeout', {})
+                    return
+                message = pubsub.get_message(timeout=EXPORT_EVENTS_KEEPALIVE)
+                if message is None:
+                    meta = None
+                    yield ": keep-alive\n\n"
+                else:
+                    meta = backend.decode_result(message['data'])
+        finally:
+            pubsub.close()
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/<path:path>')
@@ -0,0 +1,247 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, User, Professional, Service, ServiceRequest, RequestCounter
+from schedule import schedules
+
+MATCH_LIMIT = 10
+MATCH_MAX_LIMIT = 50
+MATCH_MAX_AGE = 600  # seconds before a lookup rebuilds the index from the database
+MATCH_LOAD_SCALE = 5  # open requests at which the load score halves
+MATCH_WEIGHTS = {'load': 0.35, 'completion': 0.35, 'location': 0.3}
+
+# Ranks approved, unblocked professionals for a booking from per-professional
+# features kept in memory.
+#
+# Features per professional: open requests (Pending + Accepted) and Closed /
+# Rejected counts, read from request_counters, and how many of their requests
+# were at each service location. Professionals have no location of their
+# own, so location match is the share of their past work at the requested
+# location. The score is
+#
+#     load        1 / (1 + open / MATCH_LOAD_SCALE)
+#     completion  (closed + 1) / (closed + rejected + 2)
+#     location    requests at the location / all their requests
+#
+# weighted by MATCH_WEIGHTS. Load and completion do not depend on the query,
+# so their weighted sum (the base score) orders one sorted list of all
+# professionals. Each location keeps a second sorted list, by full score, of
+# the professionals who have worked there. A query merges the location's
+# list with the base list (skipping professionals already in the first), so
+# it reads only as far down as it needs to fill `limit` available
+# professionals instead of scoring everyone.
+#
+# The routes that change service requests or professionals mark the
+# professionals they touched; the next query reloads just those before
+# ranking. Changes made by other processes show up at the next rebuild, as
+# with the typeahead index, except that a rebuild after the first runs in a
+# background thread.
+
+
+def location_key(location):
+    return " ".join((location or "").lower().split())
+
+
+class Features:
+    __slots__ = ('name', 'open', 'closed', 'rejected', 'locations', 'total', 'base')
+
+    def __init__(self, name, counts, locations):
+        self.name = name
+        self.open = counts.get('Pending', 0) + counts.get('Accepted', 0)
+        self.closed = counts.get('Closed', 0)
+        self.rejected = counts.get('Rejected', 0)
+        self.locations = locations  # location_key -> requests there
+        self.total = sum(locations.values())
+        self.base = (MATCH_WEIGHTS['load'] * self.load_score()
+                     + MATCH_WEIGHTS['completion'] * self.completion_rate())
+
+    def load_score(self):
+        return 1 / (1 + self.open / MATCH_LOAD_SCALE)
+
+    def completion_rate(self):
+        return (self.closed + 1) / (self.closed + self.rejected + 2)
+
+    def location_share(self, key):
+        return self.locations.get(key, 0) / self.total if self.total else 0.0
+
+    def score(self, key):
+        return self.base + MATCH_WEIGHTS['location'] * self.location_share(key)
+
+
+def _load_features(professional_ids=None):
+    # professional_id -> Features for approved, unblocked professionals;
+    # all of them, or those among professional_ids.
+    professionals = (
+        db.select(Professional.professional_id, User.name)
+        .join(User, Professional.user_id == User.user_id)
+        .where(Professional.approved == True, User.is_blocked == False)
+    )
+    counters = (
+        db.select(RequestCounter.owner_id, RequestCounter.status, RequestCounter.count)
+        .where(RequestCounter.scope == 'professional', RequestCounter.count != 0)
+    )
+    locations = (
+        db.select(ServiceRequest.professional_id, Service.location, func.count())
+        .join(Service, ServiceRequest.service_id == Service.service_id)
+        .group_by(ServiceRequest.professional_id, Service.location)
+    )
+    if professional_ids is not None:
+        professionals = professionals.where(Professional.professional_id.in_(professional_ids))
+        counters = counters.where(RequestCounter.owner_id.in_(professional_ids))
+        locations = locations.where(ServiceRequest.professional_id.in_(professional_ids))
+
+    counts, places = {}, {}
+    for professional_id, status, count in db.session.execute(counters):
+        counts.setdefault(professional_id, {})[status] = count
+    for professional_id, location, count in db.session.execute(locations):
+        key = location_key(location)
+        place = places.setdefault(professional_id, {})
+        place[key] = place.get(key, 0) + count
+    return {
+        professional_id: Features(name, counts.get(professional_id, {}), places.get(professional_id, {}))
+        for professional_id, name in db.session.execute(professionals)
+    }
+
+
+class MatchIndex:
+    def __init__(self):
+        self.features = {}  # professional_id -> Features
+        self.ranked = []  # (-base, professional_id)
+        self.by_location = {}  # location_key -> [(-score, professional_id)]
+        self.dirty = set()
+        self.replayed = set()  # reloaded while a rebuild was reading; reloaded again after it
+        self.built_at = None
+        self.expired = False
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        with self.lock:
+            self.rebuilding, self.expired = True, False
+        try:
+            features = _load_features()
+            ranked = sorted((-item.base, professional_id) for professional_id, item in features.items())
+            by_location = {}
+            for professional_id, item in features.items():
+                for key in item.locations:
+                    by_location.setdefault(key, []).append((-item.score(key), professional_id))
+            for entries in by_location.values():
+                entries.sort()
+            with self.lock:
+                self.features = features
+                self.ranked = ranked
+                self.by_location = by_location
+                self.built_at = time.monotonic()
+        finally:
+            with self.lock:
+                # The rebuild may have read these before they changed.
+                self.dirty |= self.replayed
+                self.replayed = set()
+                self.rebuilding = False
+
+    def _rebuild_in_background(self, app):
+        with app.app_context():
+            try:
+                self.rebuild()
+            except Exception:
+                app.logger.exception("Rebuilding the match index failed")
+            finally:
+                db.session.remove()
+
+    def is_stale(self, max_age=MATCH_MAX_AGE):
+        return self.built_at is None or self.expired or time.monotonic() - self.built_at > max_age
+
+    def expire(self):
+        # For changes that move many professionals at once, e.g. a service's
+        # location.
+        with self.lock:
+            self.expired = True
+
+    def touch(self, *professional_ids):
+        # Marks professionals whose requests, approval or block state changed.
+        with self.lock:
+            self.dirty.update(professional_id for professional_id in professional_ids if professional_id is not None)
+
+    def refresh(self):
+        # The first build happens in the caller. Later ones read the whole
+        # table for seconds at 50k professionals, so they run in a thread
+        # while lookups keep using the current index.
+        if self.built_at is None:
+            self.rebuild()
+            return
+        with self.lock:
+            start = self.is_stale() and not self.rebuilding
+            self.rebuilding = self.rebuilding or start
+            dirty, self.dirty = self.dirty, set()
+            if self.rebuilding:
+                self.replayed |= dirty
+        if start:
+            threading.Thread(target=self._rebuild_in_background, args=(current_app._get_current_object(),),
+                             daemon=True).start()
+        if dirty:
+            features = _load_features(dirty)
+            with self.lock:
+                for professional_id in dirty:
+                    self._replace(professional_id, features.get(professional_id))
+
+    @staticmethod
+    def _discard(entries, entry):
+        index = bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            del entries[index]
+
+    def _replace(self, professional_id, item):
+        old = self.features.pop(professional_id, None)
+        if old is not None:
+            self._discard(self.ranked, (-old.base, professional_id))
+            for key in old.locations:
+                self._discard(self.by_location[key], (-old.score(key), professional_id))
+        if item is not None:
+            self.features[professional_id] = item
+            insort(self.ranked, (-item.base, professional_id))
+            for key in item.locations:
+                insort(self.by_location.setdefault(key, []), (-item.score(key), professional_id))
+
+    def rank(self, location, limit=MATCH_LIMIT, available=None):
+        # Up to `limit` (professional_id, score, Features), best first, for
+        # which available(professional_id) is true.
+        key = location_key(location)
+        results = []
+        with self.lock:
+            local = self.by_location.get(key, [])
+            ranked = self.ranked
+            i = j = 0
+            while len(results) < limit:
+                while j < len(ranked) and key in self.features[ranked[j][1]].locations:
+                    j += 1  # ranked by full score in the location's own list
+                if i < len(local) and (j >= len(ranked) or local[i] <= ranked[j]):
+                    score, professional_id = local[i]
+                    i += 1
+                elif j < len(ranked):
+                    score, professional_id = ranked[j]
+                    j += 1
+                else:
+                    break
+                if available is None or available(professional_id):
+                    results.append((professional_id, -score, self.features[professional_id]))
+        return results
+
+
+matches = MatchIndex()
+
+
+def free_on(day, minutes):
+    # available() for rank(): professionals booked by day always are;
+    # scheduled ones need `minutes` of free time on that day.
+    start = datetime.combine(day, datetime.min.time())
+    length = timedelta(minutes=minutes)
+    schedules.refresh()
+
+    def available(professional_id):
+        if not schedules.is_scheduled(professional_id):
+            return True
+        return any(end - begin >= length for begin, end in schedules.free(professional_id, start, start + timedelta(days=1)))
+    return available
@@ -0,0 +1,216 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+# Schema upgrades applied at startup. db.create_all() only creates tables that
+# are missing, so anything added to an existing table (indexes, columns,
+# triggers) goes here as a numbered step. Steps run once, in order, and are
+# recorded in schema_migrations; each step should also be safe to re-run.
+#
+# Steps that need raw SQL branch on db.engine.dialect.name; SQLite and
+# PostgreSQL are supported.
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def create_declared_indexes(db, names):
+    # Indexes declared in __table_args__ are only emitted by create_all for
+    # new tables; create the named ones if an older database file is missing
+    # them. Each step names only the indexes it introduced: the metadata
+    # always describes the latest schema, and an early step on an old file
+    # runs before later steps have added the columns (or cleaned up the data)
+    # that newer indexes need.
+    indexes = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        indexes[name].create(db.engine, checkfirst=True)
+
+
+def create_service_request_indexes(db):
+    create_declared_indexes(db, ('ix_service_requests_professional_status', 'ix_service_requests_customer_date',
+                                 'ix_service_requests_request_date', 'ix_service_requests_status'))
+
+
+def create_keyset_indexes(db):
+    create_declared_indexes(db, ('ix_service_requests_professional', 'ix_service_requests_customer'))
+
+
+# data_versions holds DATA_VERSION_SHARDS counters per tracked table; each
+# write bumps one picked at random and readers sum them. A single counter row
+# is locked by every writing transaction until it commits, so on PostgreSQL
+# all writes to the table would queue on it. Spreading the bumps only divides
+# that contention: two transactions still wait for each other when they pick
+# the same shard, so raise the shard count if that shows up under load.
+DATA_VERSION_SHARDS = 16
+
+
+def create_data_version_triggers(db):
+    # Keep data_versions in step with every write to the tracked tables,
+    # whichever process or code path makes it. Also moves a database from
+    # the single-counter table to the sharded one.
+    dialect = db.engine.dialect.name
+    columns = {column['name'] for column in inspect(db.engine).get_columns('data_versions')}
+    if 'shard' not in columns:
+        # Carry the old counts into shard 0, so no fingerprint comes round
+        # again and matches an export cached for older data.
+        with db.engine.begin() as conn:
+            versions = conn.execute(text("SELECT table_name, version FROM data_versions")).all()
+            conn.execute(text("DROP TABLE data_versions"))
+        db.metadata.tables['data_versions'].create(db.engine)
+        if versions:
+            with db.engine.begin() as conn:
+                conn.execute(text("INSERT INTO data_versions (table_name, shard, version) VALUES (:table, 0, :version)"),
+                             [{'table': table, 'version': version} for table, version in versions])
+    with db.engine.begin() as conn:
+        if dialect == 'postgresql':
+            conn.execute(text(
+                "CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$ BEGIN "
+                "UPDATE data_versions SET version = version + 1 "
+                "WHERE table_name = TG_TABLE_NAME AND shard = floor(random() * TG_ARGV[0]::int); "
+                "RETURN NULL; END $$ LANGUAGE plpgsql"
+            ))
+        for table in ('service_requests',):
+            existing = set(conn.execute(text("SELECT shard FROM data_versions WHERE table_name = :table"),
+                                        {'table': table}).scalars())
+            missing = [{'table': table, 'shard': shard} for shard in range(DATA_VERSION_SHARDS) if shard not in existing]
+            if missing:
+                conn.execute(text("INSERT INTO data_versions (table_name, shard, version) VALUES (:table, :shard, 0)"),
+                             missing)
+            if dialect == 'postgresql':
+                # One bump per statement is enough: readers only compare versions.
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_version ON {table}"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                    f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('{DATA_VERSION_SHARDS}')"
+                ))
+                continue
+            for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_version_{operation.lower()}"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {table}_version_{operation.lower()} "
+                    f"AFTER {operation} ON {table} BEGIN "
+                    f"UPDATE data_versions SET version = version + 1 "
+                    f"WHERE table_name = '{table}' AND shard = abs(random() % {DATA_VERSION_SHARDS}); "
+                    f"END"
+                ))
+
+
+# Full-text indexes: FTS5 tables over (table, key, columns), kept in sync by
+# triggers. They are external-content tables, so the text itself is only
+# stored once, in the base table.
+FTS_INDEXES = [
+    ('services', 'service_id', ('name', 'description', 'location')),
+    ('users', 'user_id', ('name',)),
+]
+
+
+def create_fts_indexes(db):
+    # SQLite only; search.py uses ILIKE on other backends.
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        for table, key, columns in FTS_INDEXES:
+            fts = f"{table}_fts"
+            cols = ", ".join(columns)
+            new_values = ", ".join(f"new.{column}" for column in columns)
+            old_values = ", ".join(f"old.{column}" for column in columns)
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, content='{table}', content_rowid='{key}', prefix='2 3')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.{key}, {new_values}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.{key}, {old_values}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN "
+                f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.{key}, {old_values}); "
+                f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.{key}, {new_values}); END"
+            ))
+            # Index whatever is already in the base table.
+            conn.execute(text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"))
+
+
+def create_unique_user_name_index(db):
+    # Usernames were only kept unique by a lookup in register, so an old
+    # database can hold duplicates; they have to be resolved by hand.
+    with db.engine.connect() as conn:
+        duplicates = conn.execute(text(
+            "SELECT user_name FROM users GROUP BY user_name HAVING COUNT(*) > 1"
+        )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Cannot make users.user_name unique, duplicated: {', '.join(duplicates)}")
+    create_declared_indexes(db, ('uq_users_user_name',))
+
+
+def rebuild_request_counters(db):
+    # Recomputes request_counters from service_requests in one transaction.
+    # Also the nightly reconciliation job.
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == 'postgresql':
+            # Hold off writers so no request is counted twice or missed.
+            conn.execute(text("LOCK TABLE service_requests IN SHARE MODE"))
+        conn.execute(text("DELETE FROM request_counters"))
+        for scope, owner, group_by in (('customer', 'customer_id', 'customer_id, status'),
+                                       ('professional', 'professional_id', 'professional_id, status')):
+            conn.execute(text(
+                f"INSERT INTO request_counters (scope, owner_id, status, count) "
+                f"SELECT '{scope}', {owner}, status, COUNT(*) FROM service_requests GROUP BY {group_by}"
+            ))
+
+
+def add_scheduled_end_column(db):
+    # service_requests predates scheduled_end; create_all will not add it.
+    columns = {column['name'] for column in inspect(db.engine).get_columns('service_requests')}
+    if 'scheduled_end' not in columns:
+        column_type = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+        with db.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE service_requests ADD COLUMN scheduled_end {column_type}"))
+    create_declared_indexes(db, ('ix_service_requests_professional_date', 'ix_service_requests_scheduled_end'))
+
+
+def drop_overall_request_counters(db):
+    # Overall totals are summed from the professional rows now.
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM request_counters WHERE scope = 'all'"))
+
+
+def create_slot_end_index(db):
+    create_declared_indexes(db, ('ix_availability_slots_ends_at',))
+
+
+MIGRATIONS = [
+    (1, 'service request indexes', create_service_request_indexes),
+    (2, 'data version triggers', create_data_version_triggers),
+    (3, 'keyset pagination indexes', create_keyset_indexes),
+    (4, 'full-text search indexes', create_fts_indexes),
+    (5, 'unique user names', create_unique_user_name_index),
+    (6, 'request counters', rebuild_request_counters),
+    (7, 'scheduled bookings', add_scheduled_end_column),
+    (8, 'overall request counters from professional rows', drop_overall_request_counters),
+    (9, 'sharded data versions', create_data_version_triggers),
+    (10, 'availability slot end index', create_slot_end_index),
+]
+
+
+def upgrade_schema(db):
+    db.create_all()
+    with db.engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        step(db)
+        with db.engine.begin() as conn:
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.now()))
+        print(f"Applied schema migration {version}: {name}")
+
@@ -1,10 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask import Flask
 from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import PASSWORD_HASH_METHOD
+from database import configure_database
+from migrations import upgrade_schema
 
 
 app=Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.sqlite3"
+configure_database(app)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy()
 db.init_app(app)
@@ -18,8 +21,13 @@ class User(db.Model):
     password = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(50), nullable=False)
     is_blocked = db.Column(db.Boolean, default=False)
+    # Registration relies on these constraints instead of looking names up
+    # first; email_id is unique through its column.
+    __table_args__ = (
+        db.Index('uq_users_user_name', 'user_name', unique=True),
+    )
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
     def check_password(self, password):
         return check_password_hash(self.password, password)
@@ -62,19 +70,116 @@ class ServiceRequest(db.Model):
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
     request_date = db.Column(db.DateTime, nullable=False)
     completion_date = db.Column(db.DateTime, nullable=True)
+    # End of the booked interval starting at request_date; NULL for requests
+    # booked by day only (see schedule.py).
+    scheduled_end = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.String(50), nullable=False)
     service = db.relationship('Service', backref=db.backref('service_requests', lazy=True))
     professional = db.relationship('Professional', back_populates='service_requests', lazy=True)
     customer = db.relationship('Customer', backref=db.backref('service_requests', lazy=True))
-with app.app_context():
-    db.create_all()
+    __table_args__ = (
+        db.Index('ix_service_requests_professional_status', 'professional_id', 'status'),
+        db.Index('ix_service_requests_customer_date', 'customer_id', 'request_date'),
+        db.Index('ix_service_requests_request_date', 'request_date'),
+        db.Index('ix_service_requests_status', 'status'),
+        # Single-column indexes end in the rowid, so they serve keyset pages
+        # (WHERE professional_id = ? AND servicerequest_id > ? ORDER BY
+        # servicerequest_id) without a sort.
+        db.Index('ix_service_requests_professional', 'professional_id'),
+        db.Index('ix_service_requests_customer', 'customer_id'),
+        db.Index('ix_service_requests_professional_date', 'professional_id', 'request_date'),
+        db.Index('ix_service_requests_scheduled_end', 'scheduled_end'),
+    )
+# Change counters per table, split over shards; triggers bump a random shard
+# on every insert, update and delete (see migrations.py). Their sum
+# fingerprints the data for export caching.
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    table_name = db.Column(db.String(80), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Service request counts per status, kept per customer and per professional.
+# Maintained by the handlers that write service_requests (see counters.py)
+# and rebuilt nightly.
+class RequestCounter(db.Model):
+    __tablename__ = 'request_counters'
+    scope = db.Column(db.String(20), primary_key=True)
+    owner_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Service requests per customer per request_date day, aggregated by the
+# nightly rollup (see rollups.py). Status counts are as of the last time the
+# day was rolled up. Feeds the monthly report and the admin analytics.
+class DailyCustomerActivity(db.Model):
+    __tablename__ = 'daily_customer_activity'
+    day = db.Column(db.Date, primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_requests = db.Column(db.Integer, nullable=False, default=0)
+    pending_requests = db.Column(db.Integer, nullable=False, default=0)
+    accepted_requests = db.Column(db.Integer, nullable=False, default=0)
+    closed_requests = db.Column(db.Integer, nullable=False, default=0)
+    rejected_requests = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (
+        db.Index('ix_daily_customer_activity_customer_day', 'customer_id', 'day'),
+    )
+
+
+# Working hours a professional has published. Bookings must fall inside
+# them once a professional has any (see schedule.py).
+class AvailabilitySlot(db.Model):
+    __tablename__ = 'availability_slots'
+    slot_id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professionals.professional_id'), nullable=False)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.Index('ix_availability_slots_professional_start', 'professional_id', 'starts_at'),
+        # The schedule index rebuild reads slots ending after a cutoff.
+        db.Index('ix_availability_slots_ends_at', 'ends_at'),
+    )
+
+
+# Emails waiting to be sent, written in the same transaction as the event
+# they report and sent by the drain_email_outbox task (see outbox.py).
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    outbox_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    available_at = db.Column(db.DateTime, nullable=False)  # not claimed before this; pushed back on failure
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_available', 'status', 'available_at'),
+    )
+
+
+# Last day each rollup has completed, so an interrupted run resumes there.
+class RollupWatermark(db.Model):
+    __tablename__ = 'rollup_watermarks'
+    name = db.Column(db.String(80), primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+def create_default_admin():
     if not User.query.first():  # Check if any users exist
         # Create the admin user
         admin_user = User(
             name='Admin User',  # Default name for the admin user
             user_name='admin',  # Default username for admin
             email_id='admin@example.com',  # Admin email
-            password=generate_password_hash('admin_password'),  # Default hashed password for admin
+            password=generate_password_hash('admin_password', method=PASSWORD_HASH_METHOD),  # Default hashed password for admin
             role='admin'  # Admin role
         )
 
@@ -91,6 +196,11 @@ with app.app_context():
         db.session.commit()
 
         print("Admin user created successfully.")
+
+
+with app.app_context():
+    upgrade_schema(db)
+    create_default_admin()
 if __name__ == "__main__":
     app.run(debug=True)
 
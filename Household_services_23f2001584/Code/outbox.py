@@ -0,0 +1,250 @@
+import os
+import time
+from datetime import datetime, timedelta
+from models import db, Customer, EmailOutbox, User
+from mailservices import smtp_pool, SMTP_SEND_ATTEMPTS, SMTP_TIMEOUT
+
+# Transactional email outbox.
+#
+# Code that causes an email (a new service request, a status change, the
+# periodic reminders) calls enqueue()/enqueue_many() before it commits, so
+# the email_outbox row exists exactly when the change it reports does.
+# Nothing is sent in the request.
+#
+# The drain_email_outbox task claims up to OUTBOX_BATCH_SIZE rows with one
+# UPDATE ... RETURNING, commits, sends them through the pooled SMTP
+# connections and records the outcome of the whole batch in two more
+# statements. A claim leases the row for OUTBOX_LEASE_SECONDS by moving
+# available_at forward; a worker that dies before recording leaves its rows
+# to be claimed again when the lease runs out. Delivery is therefore at least
+# once: a crash between sending and recording sends that batch again, so the
+# batch size trades SQL per message against how much can be repeated.
+#
+# A slow relay can make one send take OUTBOX_SEND_SECONDS, so a batch may not
+# finish inside its lease. The worker stops sending once the lease (less one
+# worst-case send) or the run's OUTBOX_DRAIN_SECONDS is used up, records what
+# it sent and hands the rest back as due, so no row is sent by two workers.
+#
+# Failures go back to 'pending' with an exponential backoff until
+# OUTBOX_MAX_ATTEMPTS, then stay 'failed' with the last error. A row whose
+# last attempt was claimed by a worker that died is failed when its lease
+# runs out instead of being claimed again. Refused
+# recipients fail at once. On PostgreSQL the claim skips rows another worker
+# has locked; SQLite lets one writer in at a time, which has the same effect.
+
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_RETRY_BACKOFF = 60  # seconds before the first retry, doubled on every further one
+OUTBOX_LEASE_SECONDS = 300  # a claimed row not recorded by then is claimed again
+OUTBOX_SEND_SECONDS = SMTP_SEND_ATTEMPTS * SMTP_TIMEOUT  # longest one send can take
+OUTBOX_DRAIN_SECONDS = 50  # one drain run stops claiming after this; the next picks up
+OUTBOX_POLL_SECONDS = 30  # how often beat starts a drain run
+OUTBOX_RETENTION_DAYS = 7  # sent rows are purged after this
+OUTBOX_FAILED_LIMIT = 20  # failed rows listed by /admin/email_outbox
+# The rate limit is per worker process, so total throughput is workers x
+# EMAIL_RATE_PER_WORKER; keep that under the SMTP relay's limit.
+EMAIL_RATE_PER_WORKER = float(os.environ.get("EMAIL_RATE_PER_WORKER", 10))  # messages per second
+CLAIMABLE_STATUSES = ('pending', 'sending')  # 'sending' only once its lease has run out
+
+
+class RateLimiter:
+    # Spaces calls at least 1/rate seconds apart within this process.
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+email_rate_limiter = RateLimiter(EMAIL_RATE_PER_WORKER)
+
+
+def enqueue(kind, to_email, subject, html_content):
+    # Adds one email to the caller's transaction.
+    now = datetime.now()
+    db.session.add(EmailOutbox(kind=kind, to_email=to_email, subject=subject, html_content=html_content,
+                               status='pending', attempts=0, created_at=now, available_at=now))
+
+
+def enqueue_many(kind, messages):
+    # messages: iterable of (to_email, subject, html_content), added to the
+    # caller's transaction in one executemany. Returns how many.
+    now = datetime.now()
+    rows = [{'kind': kind, 'to_email': to_email, 'subject': subject, 'html_content': html_content,
+             'status': 'pending', 'attempts': 0, 'created_at': now, 'available_at': now}
+            for to_email, subject, html_content in messages]
+    if rows:
+        db.session.execute(db.insert(EmailOutbox), rows)
+    return len(rows)
+
+
+def claim_batch(limit=OUTBOX_BATCH_SIZE):
+    # Leases up to `limit` due rows to this worker and commits the claim.
+    now = datetime.now()
+    due = (
+        db.select(EmailOutbox.outbox_id)
+        .where(EmailOutbox.status.in_(CLAIMABLE_STATUSES), EmailOutbox.available_at <= now,
+               EmailOutbox.attempts < OUTBOX_MAX_ATTEMPTS)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.outbox_id.in_(due))
+        .values(status='sending', attempts=EmailOutbox.attempts + 1, claimed_at=now,
+                available_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+        .returning(EmailOutbox.outbox_id, EmailOutbox.to_email, EmailOutbox.subject,
+                   EmailOutbox.html_content, EmailOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return claimed
+
+
+def fail_abandoned():
+    # Rows left 'sending' on their last attempt by a worker that died; the
+    # claim no longer picks them up.
+    now = datetime.now()
+    failed = db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.status == 'sending', EmailOutbox.available_at <= now,
+               EmailOutbox.attempts >= OUTBOX_MAX_ATTEMPTS)
+        .values(status='failed', available_at=now, last_error='Lease expired on the last attempt')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return failed
+
+
+def record_results(results, unsent=()):
+    # results: list of (claimed row, SendResult). Sent rows are marked in one
+    # UPDATE; failures, which each carry their own error and retry time, in
+    # one executemany. unsent: claimed rows that were not tried, handed back
+    # as due without counting the attempt.
+    now = datetime.now()
+    sent = [row.outbox_id for row, result in results if result.ok]
+    failed = [
+        {'outbox_id': row.outbox_id,
+         'status': 'failed' if result.permanent or row.attempts >= OUTBOX_MAX_ATTEMPTS else 'pending',
+         'available_at': now + timedelta(seconds=OUTBOX_RETRY_BACKOFF * 2 ** (row.attempts - 1)),
+         'last_error': result.error}
+        for row, result in results if not result.ok
+    ]
+    if sent:
+        db.session.execute(
+            db.update(EmailOutbox).where(EmailOutbox.outbox_id.in_(sent))
+            .values(status='sent', sent_at=now, last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+    if failed:
+        db.session.execute(db.update(EmailOutbox), failed)
+    if unsent:
+        db.session.execute(
+            db.update(EmailOutbox).where(EmailOutbox.outbox_id.in_([row.outbox_id for row in unsent]))
+            .values(status='pending', available_at=now, claimed_at=None, attempts=EmailOutbox.attempts - 1)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return len(sent), sum(row['status'] == 'pending' for row in failed), sum(row['status'] == 'failed' for row in failed)
+
+
+def drain(batch_size=OUTBOX_BATCH_SIZE, max_seconds=OUTBOX_DRAIN_SECONDS, pool=smtp_pool, rate_limiter=email_rate_limiter):
+    # Sends due emails batch by batch until none are left or max_seconds
+    # have passed. Returns counts for the run.
+    deadline = time.monotonic() + max_seconds
+    summary = {'claimed': 0, 'sent': 0, 'retrying': 0, 'failed': fail_abandoned(), 'released': 0}
+    while time.monotonic() < deadline:
+        # Started before the claim, so the lease is known to outlast it.
+        stop_at = min(deadline, time.monotonic() + OUTBOX_LEASE_SECONDS - OUTBOX_SEND_SECONDS)
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        results = []
+        for row in batch:
+            rate_limiter.wait()
+            if time.monotonic() >= stop_at:
+                break
+            results.append((row, pool.send(row.to_email, row.subject, row.html_content)))
+        unsent = batch[len(results):]
+        sent, retrying, failed = record_results(results, unsent)
+        summary['claimed'] += len(batch)
+        summary['sent'] += sent
+        summary['retrying'] += retrying
+        summary['failed'] += failed
+        summary['released'] += len(unsent)
+    return summary
+
+
+def purge_sent(days=OUTBOX_RETENTION_DAYS):
+    deleted = db.session.execute(
+        db.delete(EmailOutbox)
+        .where(EmailOutbox.status == 'sent', EmailOutbox.sent_at < datetime.now() - timedelta(days=days))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def outbox_status():
+    # Rows per status, the oldest due row and the latest failures.
+    counts = dict(db.session.execute(
+        db.select(EmailOutbox.status, db.func.count()).group_by(EmailOutbox.status)
+    ).all())
+    oldest_due = db.session.execute(
+        db.select(db.func.min(EmailOutbox.available_at))
+        .where(EmailOutbox.status == 'pending', EmailOutbox.available_at <= datetime.now())
+    ).scalar()
+    failed = db.session.execute(
+        db.select(EmailOutbox.outbox_id, EmailOutbox.kind, EmailOutbox.to_email, EmailOutbox.attempts,
+                  EmailOutbox.last_error, EmailOutbox.created_at)
+        .where(EmailOutbox.status == 'failed')
+        .order_by(EmailOutbox.outbox_id.desc())
+        .limit(OUTBOX_FAILED_LIMIT)
+    ).all()
+    return counts, oldest_due, failed
+
+
+# Emails for service request events, enqueued by the code that makes them.
+
+def new_request_email(name, request_id, service_name, request_date):
+    return f"""<html><body>
+    Dear {name},<br><br>
+    You have a new service request (ID {request_id}) for {service_name} on {request_date:%Y-%m-%d %H:%M}.
+    Please log in to your account to accept or reject it.<br><br>
+    Best Regards,<br>Service Team</body></html>"""
+
+
+def status_change_email(name, request_id, status):
+    return f"""<html><body>
+    Dear {name},<br><br>
+    Your service request (ID {request_id}) is now {status}.<br><br>
+    Best Regards,<br>Service Team</body></html>"""
+
+
+def notify_new_request(service_request, professional, service):
+    # service_request must be flushed, so that it has an id.
+    enqueue('new_request', professional.user.email_id, "New Service Request",
+            new_request_email(professional.user.name, service_request.servicerequest_id, service.name,
+                              service_request.request_date))
+
+
+def notify_status_changes(changes):
+    # changes: list of (servicerequest_id, customer_id, new status).
+    if not changes:
+        return 0
+    rows = db.session.execute(
+        db.select(Customer.customer_id, User.email_id, User.name)
+        .join(User, Customer.user_id == User.user_id)
+        .where(Customer.customer_id.in_({customer_id for _, customer_id, _ in changes}))
+    )
+    customers = {customer_id: (email_id, name) for customer_id, email_id, name in rows}
+    return enqueue_many('status_change', (
+        (customers[customer_id][0], f"Service Request {status}",
+         status_change_email(customers[customer_id][1], request_id, status))
+        for request_id, customer_id, status in changes if customer_id in customers
+    ))
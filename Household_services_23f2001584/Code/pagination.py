@@ -0,0 +1,97 @@
+import base64
+import binascii
+import json
+from flask import request
+from models import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(key, int) or isinstance(key, bool):
+        raise PaginationError("Invalid cursor")
+    return key
+
+
+class Page:
+    # Keyset pagination for list endpoints.
+    #
+    # Reads ?limit=, ?cursor= and ?fields= from the request. columns maps each
+    # field the endpoint can return to its column expression; only the
+    # requested fields (plus the key) are selected. Rows are ordered by the
+    # key column and a page starts strictly after the cursor, so each page is
+    # an index seek however deep the client has paged.
+
+    def __init__(self, columns, key, limit, after, fields):
+        self.columns = columns
+        self.key = key
+        self.limit = limit
+        self.after = after
+        self.fields = fields
+
+    @classmethod
+    def from_request(cls, columns, key):
+        try:
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise PaginationError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+
+        fields = list(columns)
+        if request.args.get('fields'):
+            fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in columns]
+            if unknown:
+                raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+        return cls(columns, key, limit, after, fields)
+
+    def wants(self, *fields):
+        return any(field in self.fields for field in fields)
+
+    def select(self):
+        # The caller adds joins and filters; ordering, the cursor bound and
+        # the limit (one extra row to detect a next page) are applied here.
+        selected = dict.fromkeys(self.fields + [self.key])
+        key_column = self.columns[self.key]
+        query = (
+            db.select(*(self.columns[field].label(field) for field in selected))
+            .order_by(key_column)
+            .limit(self.limit + 1)
+        )
+        if self.after is not None:
+            query = query.where(key_column > self.after)
+        return query
+
+    def response(self, rows, formatters=None):
+        formatters = formatters or {}
+        items = []
+        for row in rows[:self.limit]:
+            item = {}
+            for field in self.fields:
+                value = row._mapping[field]
+                if field in formatters and value is not None:
+                    value = formatters[field](value)
+                item[field] = value
+            items.append(item)
+        next_cursor = None
+        if len(rows) > self.limit:
+            next_cursor = encode_cursor(rows[self.limit - 1]._mapping[self.key])
+        return {'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,82 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing off the request thread.
+#
+# scrypt/pbkdf2 cost tens of milliseconds of CPU per call. Hashes are
+# computed in a process pool so a burst of logins keeps those cores busy
+# without holding the GIL every other request thread needs. At most
+# PASSWORD_HASH_MAX_PENDING calls wait on the pool; beyond that callers get
+# HashingBusy rather than queueing without bound.
+#
+# PASSWORD_HASH_METHOD is a werkzeug method string in full, so it carries
+# the work factor: "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Hashes made
+# with any other method are still accepted and are rehashed on the next
+# successful login. PASSWORD_HASH_WORKERS=0 hashes inline.
+
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 8))
+PASSWORD_HASH_WAIT = 10  # seconds a caller waits for a free slot
+
+
+class HashingBusy(RuntimeError):
+    pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(PASSWORD_HASH_MAX_PENDING, 1))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _run(function, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return function(*args)
+    if not _pending.acquire(timeout=PASSWORD_HASH_WAIT):
+        raise HashingBusy("Too many password checks in progress")
+    try:
+        return _get_pool().submit(function, *args).result()
+    finally:
+        _pending.release()
+
+
+def hash_password(password):
+    return _run(_hash, password, PASSWORD_HASH_METHOD)
+
+
+def hash_passwords(passwords):
+    # For imports: spreads a whole batch over the pool in chunks.
+    if PASSWORD_HASH_WORKERS <= 0:
+        return [_hash(password, PASSWORD_HASH_METHOD) for password in passwords]
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    return list(_get_pool().map(_hash, passwords, [PASSWORD_HASH_METHOD] * len(passwords), chunksize=chunksize))
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return password_hash.split("$", 1)[0] != PASSWORD_HASH_METHOD
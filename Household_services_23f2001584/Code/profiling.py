@@ -0,0 +1,191 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request, Response, jsonify
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request instrumentation.
+#
+# Every request records its wall time, the number of SQL statements it ran
+# and their total time (from cursor events on every engine), and the
+# response size. These are aggregated per route as histograms and served in
+# Prometheus text format at /internal/metrics.
+#
+# A PROFILE_SAMPLE_RATE fraction of requests also runs under cProfile; the
+# profile is kept only if the request took longer than PROFILE_SLOW_MS, and
+# the last PROFILE_KEEP of those are listed at /internal/profiles. Only one
+# request is profiled at a time, since a thread cannot share the profiler.
+#
+# Metrics are per process. The internal endpoints answer only to loopback
+# addresses unless METRICS_ALLOWED_ADDRS says otherwise.
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 500))
+PROFILE_KEEP = 20
+PROFILE_TOP = 25  # functions listed per kept profile
+METRICS_ALLOWED_ADDRS = os.environ.get("METRICS_ALLOWED_ADDRS", "127.0.0.1,::1").split(",")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+
+METRICS = {
+    # name: (help, buckets)
+    'http_request_duration_seconds': ("Wall time per request", DURATION_BUCKETS),
+    'http_request_sql_statements': ("SQL statements per request", QUERY_COUNT_BUCKETS),
+    'http_request_sql_seconds': ("Time spent in SQL per request", DURATION_BUCKETS),
+    'http_response_size_bytes': ("Response body size", SIZE_BUCKETS),
+}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (metric, method, route) -> Histogram
+
+    def record(self, method, route, values):
+        with self.lock:
+            for metric, value in values.items():
+                if value is None:
+                    continue
+                key = (metric, method, route)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(METRICS[metric][1])
+                self.histograms[key].observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def render(self):
+        lines = []
+        with self.lock:
+            items = sorted(self.histograms.items())
+            for metric, (help_text, _) in METRICS.items():
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, method, route), histogram in items:
+                    if name != metric:
+                        continue
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.total}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+request_metrics = RequestMetrics()
+slow_profiles = deque(maxlen=PROFILE_KEEP)
+_profiler_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_statements' in g:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if started and has_request_context() and 'sql_statements' in g:
+        g.sql_seconds += time.perf_counter() - started.pop()
+        g.sql_statements += 1
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    g.profiler = None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _stop_profiler(exc=None):
+    # Also run on teardown, so a request that dies before after_request
+    # still frees the profiler for the next one.
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+    return profiler
+
+
+def _finish_request(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    profiler = _stop_profiler()
+    if profiler is not None:
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            stats = io.StringIO()
+            pstats.Stats(profiler, stream=stats).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            slow_profiles.append({
+                'route': _route(), 'method': request.method, 'path': request.full_path,
+                'duration_ms': round(elapsed * 1000, 1), 'at': time.time(), 'stats': stats.getvalue(),
+            })
+    # Streamed bodies (exports, event streams) have no size up front.
+    size = None if response.is_streamed else response.calculate_content_length()
+    request_metrics.record(request.method, _route(), {
+        'http_request_duration_seconds': elapsed,
+        'http_request_sql_statements': g.sql_statements,
+        'http_request_sql_seconds': g.sql_seconds,
+        'http_response_size_bytes': size,
+    })
+    return response
+
+
+def _internal_only():
+    if request.remote_addr not in METRICS_ALLOWED_ADDRS:
+        return jsonify({"msg": "Not found"}), 404
+    return None
+
+
+def metrics():
+    return _internal_only() or Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def profiles():
+    return _internal_only() or jsonify(list(slow_profiles))
+
+
+def init_profiling(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_stop_profiler)
+    app.add_url_rule('/internal/metrics', 'internal_metrics', metrics)
+    app.add_url_rule('/internal/profiles', 'internal_profiles', profiles)
@@ -0,0 +1,114 @@
+from sqlalchemy import String, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.functions import FunctionElement
+from models import db, User, Customer, Professional, Service, ServiceRequest, DailyCustomerActivity
+
+# Customers and professionals both hang off the users table, so each side
+# of a service request needs its own alias of User.
+CustomerUser = aliased(User)
+ProfessionalUser = aliased(User)
+
+
+class group_concat(FunctionElement):
+    # Comma-separated aggregate of one column: group_concat() on SQLite,
+    # string_agg() on PostgreSQL.
+    type = String()
+    name = 'group_concat'
+    inherit_cache = True
+
+
+@compiles(group_concat)
+def _group_concat(element, compiler, **kw):
+    return f"group_concat({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(group_concat, 'postgresql')
+def _string_agg(element, compiler, **kw):
+    return f"string_agg(CAST({compiler.process(element.clauses, **kw)} AS TEXT), ',')"
+
+
+SERVICE_REQUEST_COLUMNS = {
+    'servicerequest_id': ServiceRequest.servicerequest_id,
+    'service_id': ServiceRequest.service_id,
+    'professional_id': ServiceRequest.professional_id,
+    'customer_id': ServiceRequest.customer_id,
+    'request_date': ServiceRequest.request_date,
+    'status': ServiceRequest.status,
+    'service_name': Service.name,
+    'customer_name': CustomerUser.name,
+    'professional_name': ProfessionalUser.name,
+}
+
+
+def service_request_columns(*fields):
+    return {field: SERVICE_REQUEST_COLUMNS[field] for field in fields}
+
+
+def service_request_rows(page, professional_id=None, customer_id=None):
+    # Listing query for service requests, one page at a time. Service,
+    # customer and professional names are joined into the same SELECT (only
+    # when requested) and come back as plain row tuples, instead of being
+    # lazy-loaded per request through the ORM relationships.
+    query = page.select().select_from(ServiceRequest)
+    if page.wants('service_name'):
+        query = query.outerjoin(Service, Service.service_id == ServiceRequest.service_id)
+    if page.wants('customer_name'):
+        query = (query.outerjoin(Customer, Customer.customer_id == ServiceRequest.customer_id)
+                 .outerjoin(CustomerUser, CustomerUser.user_id == Customer.user_id))
+    if page.wants('professional_name'):
+        query = (query.outerjoin(Professional, Professional.professional_id == ServiceRequest.professional_id)
+                 .outerjoin(ProfessionalUser, ProfessionalUser.user_id == Professional.user_id))
+    if professional_id is not None:
+        query = query.where(ServiceRequest.professional_id == professional_id)
+    if customer_id is not None:
+        query = query.where(ServiceRequest.customer_id == customer_id)
+    return db.session.execute(query).all()
+
+
+def pending_requests_by_professional(batch_size=500):
+    # One GROUP BY over the pending requests, joined to the professional's
+    # user row. Only professionals with pending work come back, and rows are
+    # streamed in batches so memory does not grow with the table.
+    query = (
+        db.select(
+            Professional.professional_id,
+            User.email_id,
+            User.name,
+            group_concat(ServiceRequest.servicerequest_id).label('pending_ids'),
+        )
+        .select_from(ServiceRequest)
+        .join(Professional, Professional.professional_id == ServiceRequest.professional_id)
+        .join(User, User.user_id == Professional.user_id)
+        .where(ServiceRequest.status == 'Pending')
+        .group_by(Professional.professional_id, User.email_id, User.name)
+        .order_by(Professional.professional_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(query):
+        pending_ids = sorted(int(i) for i in str(row.pending_ids).split(','))
+        yield row.professional_id, row.email_id, row.name, pending_ids
+
+
+def monthly_customer_activity(start, end, batch_size=500):
+    # Per-customer totals for requests in [start, end), summed from the
+    # daily_customer_activity rollup (about 30 rows per customer) rather than
+    # from service_requests, joined to the customer's user row and streamed
+    # in batches. The days must already be rolled up (see rollups.py).
+    query = (
+        db.select(
+            Customer.customer_id,
+            User.name,
+            User.email_id,
+            func.sum(DailyCustomerActivity.total_requests).label('total_requests'),
+            func.sum(DailyCustomerActivity.pending_requests).label('pending_requests'),
+        )
+        .select_from(DailyCustomerActivity)
+        .join(Customer, Customer.customer_id == DailyCustomerActivity.customer_id)
+        .join(User, User.user_id == Customer.user_id)
+        .where(DailyCustomerActivity.day >= start.date(), DailyCustomerActivity.day < end.date())
+        .group_by(Customer.customer_id, User.name, User.email_id)
+        .order_by(Customer.customer_id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.session.execute(query)
@@ -0,0 +1,113 @@
+import os
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import case, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, ServiceRequest, DailyCustomerActivity, RollupWatermark
+
+# Nightly rollup of service_requests into daily_customer_activity.
+#
+# Each day is aggregated on its own: delete that day's rows and INSERT ...
+# SELECT them again from the request_date range, then move the watermark, all
+# in one transaction. Re-running a day is therefore harmless, and a run that
+# dies part way resumes after the last day it finished.
+#
+# Requests keep changing after their day is rolled up (status updates,
+# edits, late bookings for past dates), so each run also re-aggregates the
+# last ROLLUP_REFRESH_DAYS days. Anything older keeps the counts it had when
+# it left that window.
+
+ROLLUP_NAME = 'daily_customer_activity'
+ROLLUP_REFRESH_DAYS = int(os.environ.get("ROLLUP_REFRESH_DAYS", 7))
+STATUSES = ('Pending', 'Accepted', 'Closed', 'Rejected')
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_LIMIT = 100  # customers per response with group=customer
+ANALYTICS_MAX_LIMIT = 1000
+ACTIVITY_COLUMNS = ('total_requests', 'pending_requests', 'accepted_requests', 'closed_requests', 'rejected_requests')
+
+
+def _status_count(status):
+    return func.coalesce(func.sum(case((ServiceRequest.status == status, 1), else_=0)), 0)
+
+
+def _totals():
+    return [func.sum(getattr(DailyCustomerActivity, column)).label(column) for column in ACTIVITY_COLUMNS]
+
+
+def roll_up_day(day):
+    start = datetime.combine(day, time.min)
+    aggregate = (
+        db.select(
+            literal(day, db.Date),
+            ServiceRequest.customer_id,
+            func.count(ServiceRequest.servicerequest_id),
+            *[_status_count(status) for status in STATUSES],
+        )
+        .where(ServiceRequest.request_date >= start, ServiceRequest.request_date < start + timedelta(days=1))
+        .group_by(ServiceRequest.customer_id)
+    )
+    columns = ['day', 'customer_id', *ACTIVITY_COLUMNS]
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    watermark = dialect.insert(RollupWatermark).values(name=ROLLUP_NAME, day=day, updated_at=datetime.now())
+    watermark = watermark.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'day': watermark.excluded.day, 'updated_at': watermark.excluded.updated_at},
+        where=RollupWatermark.day < watermark.excluded.day,  # refreshing old days never moves it back
+    )
+    with db.engine.begin() as conn:
+        conn.execute(db.delete(DailyCustomerActivity).where(DailyCustomerActivity.day == day))
+        conn.execute(db.insert(DailyCustomerActivity).from_select(columns, aggregate))
+        conn.execute(watermark)
+
+
+def rolled_up_through():
+    return db.session.execute(
+        db.select(RollupWatermark.day).where(RollupWatermark.name == ROLLUP_NAME)
+    ).scalar()
+
+
+def roll_up_customer_activity(through=None, refresh_days=ROLLUP_REFRESH_DAYS):
+    # Rolls up every day after the watermark, plus the last refresh_days
+    # days, up to and including `through` (default yesterday). The first run
+    # backfills from the earliest request. Returns the number of days done.
+    through = through or date.today() - timedelta(days=1)
+    last = rolled_up_through()
+    db.session.commit()  # end the read so the rollup transactions see fresh data
+    if last is None:
+        earliest = db.session.execute(db.select(func.min(ServiceRequest.request_date))).scalar()
+        if earliest is None:
+            return 0
+        first = earliest.date()
+    else:
+        first = min(last + timedelta(days=1), through - timedelta(days=refresh_days - 1))
+    day, done = first, 0
+    while day <= through:
+        roll_up_day(day)
+        day += timedelta(days=1)
+        done += 1
+    return done
+
+
+def activity_by_day(start, end, customer_id=None):
+    # Totals across customers for each day in [start, end).
+    query = (
+        db.select(DailyCustomerActivity.day, *_totals())
+        .where(DailyCustomerActivity.day >= start, DailyCustomerActivity.day < end)
+        .group_by(DailyCustomerActivity.day)
+        .order_by(DailyCustomerActivity.day)
+    )
+    if customer_id is not None:
+        query = query.where(DailyCustomerActivity.customer_id == customer_id)
+    return db.session.execute(query).all()
+
+
+def activity_by_customer(start, end, limit):
+    # Per-customer totals over [start, end), busiest customers first.
+    query = (
+        db.select(DailyCustomerActivity.customer_id, *_totals())
+        .where(DailyCustomerActivity.day >= start, DailyCustomerActivity.day < end)
+        .group_by(DailyCustomerActivity.customer_id)
+        .order_by(func.sum(DailyCustomerActivity.total_requests).desc(), DailyCustomerActivity.customer_id)
+        .limit(limit)
+    )
+    return db.session.execute(query).all()
@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from models import db, AvailabilitySlot, Professional, ServiceRequest
+
+BOOKING_DEFAULT_MINUTES = int(os.environ.get("BOOKING_DEFAULT_MINUTES", 60))
+BOOKING_MIN_MINUTES = 15
+BOOKING_MAX_MINUTES = 12 * 60
+SLOT_MAX_HOURS = 24
+AVAILABILITY_MAX_DAYS = 62  # widest range /availability answers
+SCHEDULE_HISTORY_DAYS = 7  # past days of slots and bookings kept in memory
+SCHEDULE_MAX_AGE = 300  # seconds before a lookup rebuilds the index from the database
+BLOCKING_STATUSES = ('Pending', 'Accepted')  # bookings that hold their time
+
+# Availability and double-booking checks from an in-process interval index.
+#
+# A professional who has published availability slots takes bookings only
+# inside them, and at most one Pending/Accepted booking at a time. A booking
+# runs from request_date to scheduled_end. Professionals with no slots are
+# booked by day as before, with scheduled_end left NULL.
+#
+# Per professional, a Timeline keeps the slots and the bookings as sorted,
+# non-overlapping (start, end, id) lists, so a new booking is checked with a
+# bisect into each. Free time for a range is the slots minus the bookings,
+# read from memory without touching service_requests.
+#
+# Like the typeahead index, each process updates its copy after its own
+# writes and rebuilds it when older than SCHEDULE_MAX_AGE. Bookings and slots
+# from other processes and threads can be missing until then, so the writes
+# check again in the database, with one indexed query, after
+# lock_professional() has serialised them per professional for the rest of
+# the transaction. The caller commits or rolls back to release the lock.
+
+
+class BookingConflict(Exception):
+    pass
+
+
+class Timeline:
+    def __init__(self):
+        self.slots = []  # (start, end, slot_id)
+        self.bookings = []  # (start, end, servicerequest_id)
+
+    def covers(self, start, end):
+        # True if [start, end) lies inside one slot or a run of back-to-back slots.
+        index = bisect_right(self.slots, (start, datetime.max)) - 1
+        if index < 0 or self.slots[index][1] <= start:
+            return False
+        covered_until = self.slots[index][1]
+        while covered_until < end:
+            index += 1
+            if index >= len(self.slots) or self.slots[index][0] != covered_until:
+                return False
+            covered_until = self.slots[index][1]
+        return True
+
+    @staticmethod
+    def _overlapping(intervals, start, end, exclude=None):
+        # Ids in a sorted, non-overlapping interval list that overlap [start, end).
+        index = max(bisect_left(intervals, (start,)) - 1, 0)
+        found = []
+        while index < len(intervals) and intervals[index][0] < end:
+            item_start, item_end, item_id = intervals[index]
+            if item_end > start and item_id != exclude:
+                found.append(item_id)
+            index += 1
+        return found
+
+    def booked(self, start, end, exclude=None):
+        return self._overlapping(self.bookings, start, end, exclude)
+
+    def slots_overlapping(self, start, end):
+        return self._overlapping(self.slots, start, end)
+
+    def free(self, start, end):
+        # Free intervals within [start, end): slot time not covered by a booking.
+        free = []
+        slot_index = max(bisect_left(self.slots, (start,)) - 1, 0)
+        while slot_index < len(self.slots) and self.slots[slot_index][0] < end:
+            slot_start, slot_end, _ = self.slots[slot_index]
+            slot_index += 1
+            cursor, stop = max(slot_start, start), min(slot_end, end)
+            if cursor >= stop:
+                continue
+            index = max(bisect_left(self.bookings, (cursor,)) - 1, 0)
+            while index < len(self.bookings) and self.bookings[index][0] < stop:
+                booking_start, booking_end, _ = self.bookings[index]
+                if booking_end > cursor:
+                    if booking_start > cursor:
+                        free.append([cursor, booking_start])
+                    cursor = max(cursor, booking_end)
+                index += 1
+            if cursor < stop:
+                if free and free[-1][1] == cursor:
+                    free[-1][1] = stop  # back-to-back slots read as one stretch
+                else:
+                    free.append([cursor, stop])
+        return [tuple(interval) for interval in free]
+
+
+class ScheduleIndex:
+    def __init__(self):
+        self.timelines = {}  # professional_id -> Timeline
+        self.scheduled = set()  # professionals with any published slot
+        self.bookings = {}  # servicerequest_id -> (professional_id, start, end)
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        since = datetime.combine(datetime.today().date(), datetime.min.time()) - timedelta(days=SCHEDULE_HISTORY_DAYS)
+        scheduled = set(db.session.execute(db.select(AvailabilitySlot.professional_id).distinct()).scalars())
+        slots = db.session.execute(
+            db.select(AvailabilitySlot.professional_id, AvailabilitySlot.starts_at,
+                      AvailabilitySlot.ends_at, AvailabilitySlot.slot_id)
+            .where(AvailabilitySlot.ends_at > since)
+        ).all()
+        # Status is filtered here rather than in SQL, so the query reads the
+        # short scheduled_end range instead of every Pending/Accepted row.
+        bookings = [
+            (professional_id, start, end, request_id)
+            for professional_id, start, end, request_id, status in db.session.execute(
+                db.select(ServiceRequest.professional_id, ServiceRequest.request_date, ServiceRequest.scheduled_end,
+                          ServiceRequest.servicerequest_id, ServiceRequest.status)
+                .where(ServiceRequest.scheduled_end > since)
+            )
+            if status in BLOCKING_STATUSES
+        ]
+        timelines = {}
+        for professional_id, start, end, slot_id in slots:
+            timelines.setdefault(professional_id, Timeline()).slots.append((start, end, slot_id))
+        for professional_id, start, end, request_id in bookings:
+            timelines.setdefault(professional_id, Timeline()).bookings.append((start, end, request_id))
+        for timeline in timelines.values():
+            timeline.slots.sort()
+            timeline.bookings.sort()
+        with self.lock:
+            self.timelines = timelines
+            self.scheduled = scheduled
+            self.bookings = {request_id: (professional_id, start, end)
+                             for professional_id, start, end, request_id in bookings}
+            self.built_at = time.monotonic()
+
+    def is_stale(self, max_age=SCHEDULE_MAX_AGE):
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def refresh(self):
+        if self.is_stale():
+            self.rebuild()
+
+    def is_scheduled(self, professional_id):
+        return professional_id in self.scheduled
+
+    def timeline(self, professional_id):
+        return self.timelines.get(professional_id) or Timeline()
+
+    def free(self, professional_id, start, end):
+        with self.lock:
+            return self.timeline(professional_id).free(start, end)
+
+    def slots(self, professional_id, start, end):
+        with self.lock:
+            slots = self.timeline(professional_id).slots
+            index = max(bisect_left(slots, (start,)) - 1, 0)
+            return [slot for slot in slots[index:bisect_left(slots, (end,))] if slot[1] > start]
+
+    def booked(self, professional_id, start, end):
+        with self.lock:
+            return self.timeline(professional_id).booked(start, end)
+
+    def slot_overlaps(self, professional_id, start, end):
+        with self.lock:
+            return bool(self.timeline(professional_id).slots_overlapping(start, end))
+
+    def add_slot(self, professional_id, start, end, slot_id):
+        with self.lock:
+            self.scheduled.add(professional_id)
+            insort(self.timelines.setdefault(professional_id, Timeline()).slots, (start, end, slot_id))
+
+    def remove_slot(self, professional_id, slot_id):
+        with self.lock:
+            timeline = self.timelines.get(professional_id)
+            if timeline:
+                timeline.slots = [slot for slot in timeline.slots if slot[2] != slot_id]
+
+    def sync(self, service_request):
+        # Brings the index in line with a service request after a commit.
+        self.release(service_request.servicerequest_id)
+        if service_request.scheduled_end is not None and service_request.status in BLOCKING_STATUSES:
+            booking = (service_request.request_date, service_request.scheduled_end, service_request.servicerequest_id)
+            with self.lock:
+                insort(self.timelines.setdefault(service_request.professional_id, Timeline()).bookings, booking)
+                self.bookings[service_request.servicerequest_id] = (service_request.professional_id,) + booking[:2]
+
+    def release(self, request_id):
+        with self.lock:
+            booking = self.bookings.pop(request_id, None)
+            if booking is None:
+                return
+            professional_id, start, end = booking
+            bookings = self.timelines[professional_id].bookings
+            index = bisect_left(bookings, (start, end, request_id))
+            if index < len(bookings) and bookings[index] == (start, end, request_id):
+                del bookings[index]
+
+
+schedules = ScheduleIndex()
+
+
+def lock_professional(professional_id):
+    # On PostgreSQL, a row lock on the professional. SQLite has no row locks
+    # and a SELECT there takes none; a no-op UPDATE as the first write of the
+    # transaction takes the database write lock, which other writers wait on
+    # (busy_timeout), and the reads after it see every earlier commit.
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(
+            db.select(Professional.professional_id)
+            .where(Professional.professional_id == professional_id).with_for_update()
+        )
+        return
+    db.session.execute(
+        db.update(Professional).where(Professional.professional_id == professional_id)
+        .values(professional_id=Professional.professional_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def booked_in_database(professional_id, start, end, exclude=None):
+    # Takes lock_professional() first.
+    lock_professional(professional_id)
+    query = (
+        db.select(ServiceRequest.servicerequest_id)
+        .where(ServiceRequest.professional_id == professional_id,
+               # No booking is longer than BOOKING_MAX_MINUTES, which bounds
+               # the index range to read.
+               ServiceRequest.request_date > start - timedelta(minutes=BOOKING_MAX_MINUTES),
+               ServiceRequest.request_date < end,
+               ServiceRequest.scheduled_end > start,
+               ServiceRequest.status.in_(BLOCKING_STATUSES))
+        .limit(1)
+    )
+    if exclude is not None:
+        query = query.where(ServiceRequest.servicerequest_id != exclude)
+    return db.session.execute(query).scalar() is not None
+
+
+def slot_overlap_in_database(professional_id, intervals):
+    # The first of `intervals` overlapping a published slot, or None. Takes
+    # lock_professional() first.
+    lock_professional(professional_id)
+    for start, end in intervals:
+        overlapping = db.session.execute(
+            db.select(AvailabilitySlot.slot_id)
+            .where(AvailabilitySlot.professional_id == professional_id,
+                   # No slot is longer than SLOT_MAX_HOURS.
+                   AvailabilitySlot.starts_at > start - timedelta(hours=SLOT_MAX_HOURS),
+                   AvailabilitySlot.starts_at < end,
+                   AvailabilitySlot.ends_at > start)
+            .limit(1)
+        ).scalar()
+        if overlapping is not None:
+            return start, end
+    return None
+
+
+def reserve(professional_id, start, has_time, minutes=BOOKING_DEFAULT_MINUTES, exclude=None):
+    # Returns (start, end) for a booking with this professional, or raises
+    # BookingConflict. A start without a time of day takes the first free
+    # stretch of `minutes` that day. end is None for a professional without
+    # published slots. exclude is the request being rescheduled, if any.
+    schedules.refresh()
+    if not schedules.is_scheduled(professional_id):
+        return start, None
+    length = timedelta(minutes=minutes)
+    with schedules.lock:
+        timeline = schedules.timeline(professional_id)
+        if not has_time:
+            day = datetime.combine(start.date(), datetime.min.time())
+            free = [interval for interval in timeline.free(day, day + timedelta(days=1))
+                    if interval[1] - interval[0] >= length]
+            if not free:
+                raise BookingConflict("The professional has no free time that day")
+            start = free[0][0]
+        end = start + length
+        if not timeline.covers(start, end):
+            raise BookingConflict("The professional is not available at that time")
+        if timeline.booked(start, end, exclude):
+            raise BookingConflict("The professional is already booked at that time")
+    if booked_in_database(professional_id, start, end, exclude):
+        raise BookingConflict("The professional is already booked at that time")
+    return start, end
+
+
+def parse_when(value):
+    # 'YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM' -> (datetime, has_time).
+    value = str(value).strip()
+    for pattern, has_time in (('%Y-%m-%d', False), ('%Y-%m-%dT%H:%M', True), ('%Y-%m-%d %H:%M', True),
+                              ('%Y-%m-%dT%H:%M:%S', True)):
+        try:
+            return datetime.strptime(value, pattern), has_time
+        except ValueError:
+            continue
+    raise ValueError(f"Expected YYYY-MM-DD or YYYY-MM-DDTHH:MM, got {value!r}")
+
+
+def booking_minutes(value):
+    minutes = int(value)
+    if not BOOKING_MIN_MINUTES <= minutes <= BOOKING_MAX_MINUTES:
+        raise ValueError(f"duration_minutes must be between {BOOKING_MIN_MINUTES} and {BOOKING_MAX_MINUTES}")
+    return minutes
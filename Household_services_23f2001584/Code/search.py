@@ -0,0 +1,84 @@
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db, User, Professional, Service
+
+SEARCH_LIMIT = 50  # rows returned per search; results are ranked, so the best come first
+SEARCH_MAX_TERMS = 8
+
+# Full-text search over the FTS5 indexes created by migration 4.
+#
+# User input is split into word tokens and each one becomes a quoted prefix
+# query ("plumb"*), ANDed together, so operators or quotes typed into the
+# search box can never produce an FTS syntax error. Results are ordered by
+# bm25 with matches in the name column weighted highest. Databases without
+# the FTS tables (other backends, or FTS5 compiled out) fall back to ILIKE.
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_query(term):
+    tokens = _TOKEN.findall(term or "")[:SEARCH_MAX_TERMS]
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _fts_ids(sql, match, limit):
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    try:
+        rows = db.session.execute(text(sql), {'match': match, 'limit': limit}).all()
+    except OperationalError:
+        db.session.rollback()
+        return None
+    return [row[0] for row in rows]
+
+
+def _in_rank_order(rows, ids, key):
+    position = {row_id: index for index, row_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: position[key(row)])
+
+
+def search_services(term, limit=SEARCH_LIMIT):
+    match = match_query(term)
+    if not match:
+        return db.session.execute(
+            db.select(Service).order_by(Service.service_id).limit(limit)
+        ).scalars().all()
+
+    ids = _fts_ids(
+        "SELECT rowid FROM services_fts WHERE services_fts MATCH :match "
+        "ORDER BY bm25(services_fts, 10.0, 1.0, 2.0) LIMIT :limit",
+        match, limit,
+    )
+    if ids is None:
+        return db.session.execute(
+            db.select(Service).where(Service.name.ilike(f'%{term}%'))
+            .order_by(Service.service_id).limit(limit)
+        ).scalars().all()
+    services = db.session.execute(
+        db.select(Service).where(Service.service_id.in_(ids))
+    ).scalars().all()
+    return _in_rank_order(services, ids, lambda service: service.service_id)
+
+
+def search_professionals(term, limit=SEARCH_LIMIT):
+    query = db.select(Professional, User.name).join(User, Professional.user_id == User.user_id)
+    match = match_query(term)
+    if not match:
+        return db.session.execute(query.order_by(Professional.professional_id).limit(limit)).all()
+
+    # users_fts covers every user, so the join to professionals runs inside
+    # the ranked query; otherwise customers could crowd professionals out of
+    # the limit.
+    ids = _fts_ids(
+        "SELECT professionals.user_id FROM users_fts "
+        "JOIN professionals ON professionals.user_id = users_fts.rowid "
+        "WHERE users_fts MATCH :match ORDER BY bm25(users_fts) LIMIT :limit",
+        match, limit,
+    )
+    if ids is None:
+        return db.session.execute(
+            query.where(User.name.ilike(f'%{term}%')).order_by(Professional.professional_id).limit(limit)
+        ).all()
+    rows = db.session.execute(query.where(User.user_id.in_(ids))).all()
+    return _in_rank_order(rows, ids, lambda row: row[0].user_id)
@@ -14,7 +14,50 @@ export default {
             <li><router-link to="/download-csv">Download CSV</router-link></li>
           </ul>
         </nav>
+        <p v-if="Object.keys(counts).length">
+          Service requests:
+          <span v-for="(count, status) in counts" :key="status">{{ status }}: {{ count }} </span>
+        </p>
+        <p v-if="Object.keys(outbox).length">
+          Emails:
+          <span v-for="(count, status) in outbox" :key="status">{{ status }}: {{ count }} </span>
+          <span v-if="oldestDue">(waiting since {{ oldestDue }})</span>
+        </p>
         <router-view></router-view>
       </div>
-    `
+    `,
+    data() {
+      return {
+        counts: {},
+        outbox: {},
+        oldestDue: null
+      };
+    },
+    async mounted() {
+      const token = localStorage.getItem('access_token');
+      if (!token) {
+        return;
+      }
+      try {
+        const response = await axios.get('/admin/summary', {
+          headers: {
+            Authorization: `Bearer ${token}`
+          }
+        });
+        this.counts = response.data.counts;
+      } catch (error) {
+        console.error('Error fetching request summary:', error);
+      }
+      try {
+        const response = await axios.get('/admin/email_outbox', {
+          headers: {
+            Authorization: `Bearer ${token}`
+          }
+        });
+        this.outbox = response.data.counts;
+        this.oldestDue = response.data.oldest_due;
+      } catch (error) {
+        console.error('Error fetching email outbox status:', error);
+      }
+    }
   };
\ No newline at end of file
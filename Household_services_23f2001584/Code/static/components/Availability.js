@@ -0,0 +1,82 @@
+export default {
+    template: `
+      <div>
+        <h2>My Availability</h2>
+        <p>Once you publish availability, customers can only book you inside it, one booking at a time.</p>
+        <label>Date:</label>
+        <input type="date" v-model="day" @change="fetchSlots">
+        <label>From:</label>
+        <input type="time" v-model="from">
+        <label>To:</label>
+        <input type="time" v-model="to">
+        <button @click="publishSlot" :disabled="!day || !from || !to">Publish</button>
+        <p v-if="message">{{ message }}</p>
+        <table v-if="slots.length">
+          <thead>
+            <tr>
+              <th>Start</th>
+              <th>End</th>
+              <th></th>
+            </tr>
+          </thead>
+          <tbody>
+            <tr v-for="slot in slots" :key="slot.slot_id">
+              <td>{{ slot.start }}</td>
+              <td>{{ slot.end }}</td>
+              <td><button @click="withdrawSlot(slot.slot_id)">Withdraw</button></td>
+            </tr>
+          </tbody>
+        </table>
+        <p v-else>No availability published for the next week from this date.</p>
+      </div>
+    `,
+    data() {
+      return {
+        day: new Date().toISOString().slice(0, 10),
+        from: '09:00',
+        to: '17:00',
+        slots: [],
+        message: null
+      };
+    },
+    created() {
+      this.fetchSlots();
+    },
+    methods: {
+      headers() {
+        return { Authorization: `Bearer ${localStorage.getItem('access_token')}` };
+      },
+      async fetchSlots() {
+        try {
+          const response = await axios.get('/professional/availability', {
+            headers: this.headers(),
+            params: { start: this.day || undefined }
+          });
+          this.slots = response.data.slots;
+        } catch (error) {
+          console.error('Error fetching availability:', error);
+          this.message = (error.response && error.response.data.msg) || 'Failed to load availability.';
+        }
+      },
+      async publishSlot() {
+        try {
+          await axios.post('/professional/availability', {
+            slots: [{ start: `${this.day}T${this.from}`, end: `${this.day}T${this.to}` }]
+          }, { headers: this.headers() });
+          this.message = 'Availability published.';
+          await this.fetchSlots();
+        } catch (error) {
+          this.message = (error.response && error.response.data.msg) || 'Failed to publish availability.';
+        }
+      },
+      async withdrawSlot(slot_id) {
+        try {
+          await axios.delete('/professional/availability', { headers: this.headers(), data: { slot_id } });
+          this.message = 'Slot withdrawn.';
+          await this.fetchSlots();
+        } catch (error) {
+          this.message = (error.response && error.response.data.msg) || 'Failed to withdraw the slot.';
+        }
+      }
+    }
+  };
@@ -7,9 +7,45 @@ export default {
         <br><br>
         <label for="professional">Professional ID:</label>
         <input type="text" v-model="professional_id" required>
+        <button @click="suggestProfessionals" :disabled="!service_id">Suggest professionals</button>
         <br><br>
+        <table v-if="matches.length">
+          <thead>
+            <tr>
+              <th>Professional</th>
+              <th>Open requests</th>
+              <th>Completion rate</th>
+              <th>Worked here</th>
+              <th></th>
+            </tr>
+          </thead>
+          <tbody>
+            <tr v-for="match in matches" :key="match.professional_id">
+              <td>{{ match.name }} (#{{ match.professional_id }})</td>
+              <td>{{ match.open_requests }}</td>
+              <td>{{ Math.round(match.completion_rate * 100) }}%</td>
+              <td>{{ Math.round(match.location_share * 100) }}%</td>
+              <td><button @click="professional_id = match.professional_id">Choose</button></td>
+            </tr>
+          </tbody>
+        </table>
         <label for="request_date">Request Date:</label>
         <input type="date" v-model="request_date" required>
+        <button @click="checkAvailability" :disabled="!professional_id || !request_date">Check availability</button>
+        <br><br>
+        <div v-if="availability">
+          <p v-if="!availability.scheduled">This professional is booked by day; no time needed.</p>
+          <p v-else-if="!availability.free.length">No free time on this day.</p>
+          <ul v-else>
+            <li v-for="interval in availability.free" :key="interval.start">
+              Free {{ interval.start.slice(11) }} - {{ interval.end.slice(11) }}
+            </li>
+          </ul>
+        </div>
+        <label for="request_time">Time (optional):</label>
+        <input type="time" v-model="request_time">
+        <label for="duration">Duration (minutes):</label>
+        <input type="number" v-model.number="duration_minutes" min="15" max="720" step="15">
         <br><br>
         <button @click="createServiceRequest">Submit</button>
         <p v-if="errorMessage" style="color: red;">{{ errorMessage }}</p>
@@ -21,17 +57,50 @@ export default {
         service_id: '',
         professional_id: '',
         request_date: '',
+        request_time: '',
+        duration_minutes: 60,
+        availability: null,
+        matches: [],
         errorMessage: null,
         successMessage: null,
       };
     },
     methods: {
+      async suggestProfessionals() {
+        const token = localStorage.getItem('access_token');
+        try {
+          const response = await axios.get('/customer/match_professionals', {
+            headers: { Authorization: `Bearer ${token}` },
+            params: { service_id: this.service_id, date: this.request_date || undefined, duration_minutes: this.duration_minutes }
+          });
+          this.matches = response.data.items;
+          this.errorMessage = this.matches.length ? null : 'No professional is free that day.';
+        } catch (error) {
+          this.errorMessage = (error.response && error.response.data.msg) || 'Failed to suggest professionals.';
+        }
+      },
+      async checkAvailability() {
+        const token = localStorage.getItem('access_token');
+        const next = new Date(this.request_date);
+        next.setDate(next.getDate() + 1);
+        try {
+          const response = await axios.get('/availability', {
+            headers: { Authorization: `Bearer ${token}` },
+            params: { professional_id: this.professional_id, start: this.request_date, end: next.toISOString().slice(0, 10) }
+          });
+          this.availability = response.data;
+          this.errorMessage = null;
+        } catch (error) {
+          this.errorMessage = (error.response && error.response.data.msg) || 'Failed to load availability.';
+        }
+      },
       async createServiceRequest() {
         const token = localStorage.getItem('access_token');
         const requestData = {
           service_id: this.service_id,
           professional_id: this.professional_id,
-          request_date: this.request_date,
+          request_date: this.request_time ? `${this.request_date}T${this.request_time}` : this.request_date,
+          duration_minutes: this.duration_minutes,
         };
         try {
           const response = await fetch('/customer/create_service_request', {
@@ -48,6 +117,9 @@ export default {
             this.service_id = '';
             this.professional_id = '';
             this.request_date = '';
+            this.request_time = '';
+            this.availability = null;
+            this.matches = [];
           } else {
             const errorData = await response.json();
             this.errorMessage = errorData.msg || 'Failed to create service request. Server responded with an error.';
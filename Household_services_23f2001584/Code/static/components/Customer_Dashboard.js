@@ -11,7 +11,32 @@ export default {
             <li><router-link to="/customer/search_services">Search Services</router-link></li>
           </ul>
         </nav>
+        <p v-if="Object.keys(counts).length">
+          Service requests:
+          <span v-for="(count, status) in counts" :key="status">{{ status }}: {{ count }} </span>
+        </p>
         <router-view></router-view>
       </div>
-    `
+    `,
+    data() {
+      return {
+        counts: {}
+      };
+    },
+    async mounted() {
+      const token = localStorage.getItem('access_token');
+      if (!token) {
+        return;
+      }
+      try {
+        const response = await axios.get('/customer/summary', {
+          headers: {
+            Authorization: `Bearer ${token}`
+          }
+        });
+        this.counts = response.data.counts;
+      } catch (error) {
+        console.error('Error fetching request summary:', error);
+      }
+    }
   };
\ No newline at end of file
@@ -11,7 +11,7 @@ export default {
       errorMessage: null,
       statusMessage: null,
       taskId: null,
-      intervalId: null
+      eventSource: null
     };
   },
   methods: {
@@ -25,9 +25,8 @@ export default {
 
         if (res.ok) {
           this.taskId = data['task-id'];
-          console.log()
-          this.statusMessage = "CSV generation initiated. Checking status...";
-          this.checkCsvStatus();
+          this.statusMessage = "CSV generation initiated. Waiting for the file...";
+          this.waitForCsv();
         } else {
           this.errorMessage = data.msg || "Failed to initiate CSV download.";
         }
@@ -36,38 +35,49 @@ export default {
         this.errorMessage = 'An unexpected error occurred while downloading the CSV.';
       }
     },
-    async checkCsvStatus() {
-      this.intervalId = setInterval(async () => {
-        const taskId = this.taskId;
-        console.log(taskId);
-        if (!taskId) {
-          this.errorMessage = 'Task ID is missing.';
-          clearInterval(this.intervalId);
-          return;
-        }
-
-        try {
-          const csv_res = await fetch(`http://127.0.0.1:5000/get-csv/${taskId}`);
+    waitForCsv() {
+      // The server pushes progress and a final ready/failed event, so there
+      // is no polling while the export runs.
+      const taskId = this.taskId;
+      if (!taskId) {
+        this.errorMessage = 'Task ID is missing.';
+        return;
+      }
+      this.closeEvents();
+      this.eventSource = new EventSource(`http://127.0.0.1:5000/get-csv/${taskId}/events`);
 
-          if (csv_res.ok) {
-              clearInterval(this.intervalId);
-              window.location.href = `http://127.0.0.1:5000/get-csv/${taskId}`;
-              this.statusMessage = "CSV file is ready for download."; 
-          } else {
-            clearInterval(this.intervalId);
-            this.errorMessage = "Failed to fetch CSV.";
-          }
-        } catch (error) {
-          clearInterval(this.intervalId);
-          this.errorMessage = "Error fetching CSV.";
-          console.error('Error fetching CSV:', error);
-        }
-      }, 1000); // Check every second
+      this.eventSource.addEventListener('progress', (event) => {
+        const data = JSON.parse(event.data);
+        this.statusMessage = `Generating CSV... ${data.rows_written || 0} rows written.`;
+      });
+      this.eventSource.addEventListener('ready', (event) => {
+        const data = JSON.parse(event.data);
+        this.closeEvents();
+        this.statusMessage = "CSV file is ready for download.";
+        window.location.href = `http://127.0.0.1:5000${data.url}`;
+      });
+      this.eventSource.addEventListener('failed', () => {
+        this.closeEvents();
+        this.errorMessage = "Failed to generate CSV.";
+      });
+      this.eventSource.addEventListener('timeout', () => {
+        this.closeEvents();
+        this.errorMessage = "CSV generation is taking too long. Please try again later.";
+      });
+      this.eventSource.onerror = (error) => {
+        console.error('Error waiting for CSV:', error);
+        this.closeEvents();
+        this.errorMessage = "Error fetching CSV.";
+      };
+    },
+    closeEvents() {
+      if (this.eventSource) {
+        this.eventSource.close();
+        this.eventSource = null;
+      }
     }
   },
   beforeDestroy() {
-    if (this.intervalId) {
-      clearInterval(this.intervalId);
-    }
+    this.closeEvents();
   }
-};
\ No newline at end of file
+};
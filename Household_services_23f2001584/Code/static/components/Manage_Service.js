@@ -25,6 +25,7 @@ export default {
           </tr>
         </tbody>
       </table>
+      <button v-if="nextCursor" class="btn btn-secondary" @click="fetchServices(true)">Load more</button>
       <p v-if="errorMessage" style="color: red;">{{ errorMessage }}</p>
       <p v-if="successMessage" style="color: green;">{{ successMessage }}</p>
     </div>
@@ -32,6 +33,7 @@ export default {
   data() {
     return {
       services: [],
+      nextCursor: null,
       errorMessage: null,
       successMessage: null,
     };
@@ -40,7 +42,7 @@ export default {
     this.fetchServices();
   },
   methods: {
-    fetchServices() {
+    fetchServices(loadMore = false) {
       const token = localStorage.getItem('access_token');
       if (!token) {
         this.errorMessage = 'Unauthorized! Please log in.';
@@ -52,9 +54,11 @@ export default {
           headers: {
             Authorization: `Bearer ${token}`,
           },
+          params: { cursor: loadMore ? this.nextCursor : undefined },
         })
         .then((response) => {
-          this.services = response.data;
+          this.services = loadMore ? this.services.concat(response.data.items) : response.data.items;
+          this.nextCursor = response.data.next_cursor;
         })
         .catch((error) => {
           console.error('There was an error fetching the services!', error);
@@ -65,6 +65,7 @@ export default {
             </tr>
           </tbody>
         </table>
+        <button v-if="nextCursor" class="btn btn-secondary" @click="fetchServiceRequests(true)">Load more</button>
       </div>
       
       <div v-if="errorMessage" class="alert alert-danger alert-dismissible fade show mt-3" role="alert">
@@ -82,6 +83,7 @@ export default {
   data() {
     return {
       serviceRequests: [],
+      nextCursor: null,
       errorMessage: null,
       successMessage: null,
       isLoading: false,
@@ -121,7 +123,7 @@ export default {
       }
     },
 
-    async fetchServiceRequests() {
+    async fetchServiceRequests(loadMore = false) {
       const token = localStorage.getItem('access_token');
       if (!token) {
         this.setMessage('Unauthorized! Please log in.', 'error');
@@ -131,9 +133,11 @@ export default {
       this.isLoading = true;
       try {
         const response = await axios.get('/customer/manage_service_requests', {
-          headers: { Authorization: `Bearer ${token}` }
+          headers: { Authorization: `Bearer ${token}` },
+          params: { cursor: loadMore ? this.nextCursor : undefined }
         });
-        this.serviceRequests = response.data;
+        this.serviceRequests = loadMore ? this.serviceRequests.concat(response.data.items) : response.data.items;
+        this.nextCursor = response.data.next_cursor;
       } catch (error) {
         console.error('Error fetching service requests:', error);
         const message = error.response?.status === 401 
@@ -25,11 +25,13 @@ export default {
           </tr>
         </tbody>
       </table>
+      <button v-if="nextCursor" class="btn btn-secondary" @click="fetchUsers(true)">Load more</button>
     </div>
   `,
   data() {
     return {
       users: [],
+      nextCursor: null,
     };
   },
   computed: {
@@ -41,7 +43,7 @@ export default {
     this.fetchUsers();
   },
   methods: {
-    fetchUsers() {
+    fetchUsers(loadMore = false) {
       const token = localStorage.getItem('access_token');
       if (!token) {
         this.errorMessage = 'Unauthorized! Please log in.';
@@ -53,10 +55,11 @@ export default {
           headers: {
             Authorization: `Bearer ${token}`,
           },
+          params: { cursor: loadMore ? this.nextCursor : undefined },
         })
         .then((response) => {
-          this.users = response.data;
-          console.log(this.users);
+          this.users = loadMore ? this.users.concat(response.data.items) : response.data.items;
+          this.nextCursor = response.data.next_cursor;
         })
         .catch((error) => {
           console.error('There was an error fetching the users!', error);
@@ -7,9 +7,35 @@ export default {
             <li><router-link to="/professional/view_services">View Services</router-link></li>
             <li><router-link to="/professional/service_requests">Service Requests</router-link></li>
             <li><router-link to="/professional/service_requests/update_status">Update Service Requests </router-link></li>
+            <li><router-link to="/professional/availability">My Availability</router-link></li>
           </ul>
         </nav>
+        <p v-if="Object.keys(counts).length">
+          Service requests:
+          <span v-for="(count, status) in counts" :key="status">{{ status }}: {{ count }} </span>
+        </p>
         <router-view></router-view>
       </div>
-    `
+    `,
+    data() {
+      return {
+        counts: {}
+      };
+    },
+    async mounted() {
+      const token = localStorage.getItem('access_token');
+      if (!token) {
+        return;
+      }
+      try {
+        const response = await axios.get('/professional/summary', {
+          headers: {
+            Authorization: `Bearer ${token}`
+          }
+        });
+        this.counts = response.data.counts;
+      } catch (error) {
+        console.error('Error fetching request summary:', error);
+      }
+    }
   };
\ No newline at end of file
@@ -5,7 +5,10 @@ export default {
         <form @submit.prevent="searchServices">
           <div>
             <label for="name">Service Name:</label>
-            <input type="text" v-model="name" id="name">
+            <input type="text" v-model="name" id="name" list="service-suggestions" autocomplete="off" @input="fetchSuggestions">
+            <datalist id="service-suggestions">
+              <option v-for="suggestion in suggestions" :key="suggestion.id" :value="suggestion.name"></option>
+            </datalist>
           </div>
           <button type="submit">Search</button>
         </form>
@@ -23,10 +26,36 @@ export default {
     data() {
       return {
         name: '',
-        services: []
+        services: [],
+        suggestions: []
       };
     },
     methods: {
+      async fetchSuggestions() {
+        const token = localStorage.getItem('access_token');
+        if (!token || !this.name.trim()) {
+          this.suggestions = [];
+          return;
+        }
+        const query = this.name;
+        try {
+          const response = await axios.get('/search/suggest', {
+            headers: {
+              Authorization: `Bearer ${token}`
+            },
+            params: {
+              q: query,
+              type: 'service'
+            }
+          });
+          // Ignore answers for text the user has already typed past.
+          if (query === this.name) {
+            this.suggestions = response.data.suggestions;
+          }
+        } catch (error) {
+          console.error('Error fetching suggestions:', error);
+        }
+      },
       async searchServices() {
         const token = localStorage.getItem('access_token');
         if (!token) {
@@ -23,12 +23,14 @@ export default {
           </tbody>
         </table>
         <p v-else>No service requests found.</p>
+        <button v-if="nextCursor" @click="fetchServiceRequests(true)">Load more</button>
       </div>
     `,
     
     data() {
       return {
-        serviceRequests: []
+        serviceRequests: [],
+        nextCursor: null
       };
     },
   
@@ -37,7 +39,7 @@ export default {
     },
   
     methods: {
-      async fetchServiceRequests() {
+      async fetchServiceRequests(loadMore = false) {
         const token = localStorage.getItem('access_token');
         
         if (!token) {
@@ -49,10 +51,12 @@ export default {
           const response = await axios.get('/professional/service_requests', {
             headers: {
               Authorization: `Bearer ${token}`
-            }
+            },
+            params: { cursor: loadMore ? this.nextCursor : undefined }
           });
           
-          this.serviceRequests = response.data;
+          this.serviceRequests = loadMore ? this.serviceRequests.concat(response.data.items) : response.data.items;
+          this.nextCursor = response.data.next_cursor;
         } catch (error) {
           console.error('Error fetching service requests:', error);
           if (error.response?.status === 401) {
@@ -5,9 +5,16 @@ export default {
         <div v-if="error" class="error-message">
           {{ error }}
         </div>
+        <div v-if="selected.length">
+          {{ selected.length }} selected:
+          <button @click="bulkUpdate('accept')" :disabled="isLoading">Accept selected</button>
+          <button @click="bulkUpdate('reject')" :disabled="isLoading">Reject selected</button>
+          <button @click="bulkUpdate('close')" :disabled="isLoading">Close selected</button>
+        </div>
         <table>
           <thead>
             <tr>
+              <th></th>
               <th>Service Request ID</th>
               <th>Service Name</th>
               <th>Customer Name</th>
@@ -18,6 +25,7 @@ export default {
           </thead>
           <tbody>
             <tr v-for="request in serviceRequests" :key="request.servicerequest_id">
+              <td><input type="checkbox" :value="request.servicerequest_id" v-model="selected" :disabled="request.status === 'Closed'"></td>
               <td>{{ request.servicerequest_id }}</td>
               <td>{{ request.service_name }}</td>
               <td>{{ request.customer_name }}</td>
@@ -47,12 +55,15 @@ export default {
           </tbody>
         </table>
         <p v-if="serviceRequests.length === 0">No service requests found.</p>
+        <button v-if="nextCursor" @click="fetchServiceRequests(true)">Load more</button>
       </div>
     `,
   
     data() {
       return {
         serviceRequests: [],
+        selected: [],
+        nextCursor: null,
         error: null,
         isLoading: false
       };
@@ -63,7 +74,7 @@ export default {
     },
   
     methods: {
-      async fetchServiceRequests() {
+      async fetchServiceRequests(loadMore = false) {
         const token = localStorage.getItem('access_token');
         if (!token) {
           this.$router.push('/login');
@@ -74,10 +85,11 @@ export default {
           const response = await axios.get('/professional/service_requests', {
             headers: {
               Authorization: `Bearer ${token}`
-            }
+            },
+            params: { cursor: loadMore ? this.nextCursor : undefined }
           });
-          this.serviceRequests = response.data;
-          console.log(this.serviceRequests);
+          this.serviceRequests = loadMore ? this.serviceRequests.concat(response.data.items) : response.data.items;
+          this.nextCursor = response.data.next_cursor;
           this.error = null;
         } catch (error) {
           console.error('Error fetching service requests:', error);
@@ -127,6 +139,27 @@ export default {
         });
       },
   
+      async bulkUpdate(action) {
+        this.isLoading = true;
+        this.error = null;
+        const token = localStorage.getItem('access_token');
+        try {
+          const response = await axios.post('/professional/service_requests/bulk_update_status', {
+            items: this.selected.map(servicerequest_id => ({ servicerequest_id, action }))
+          }, {
+            headers: { 'Authorization': `Bearer ${token}` }
+          });
+          const { updated, failed } = response.data;
+          this.selected = [];
+          await this.fetchServiceRequests();
+          this.error = failed ? `Updated ${updated} request(s); ${failed} could not be ${action}ed.` : `Updated ${updated} request(s).`;
+        } catch (error) {
+          this.handleError(error, `Failed to ${action} the selected requests.`);
+        } finally {
+          this.isLoading = false;
+        }
+      },
+
       handleError(error, defaultMessage) {
         if (error.response) {
           // Server responded with an error
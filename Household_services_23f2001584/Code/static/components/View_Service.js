@@ -29,6 +29,7 @@ export default {
               </tr>
             </tbody>
           </table>
+          <button v-if="nextCursor" class="btn btn-secondary" @click="fetchServices(true)">Load more</button>
         </div>
         
         <div v-if="errorMessage" class="alert alert-danger alert-dismissible fade show mt-3" role="alert">
@@ -46,6 +47,7 @@ export default {
     data() {
       return {
         services: [],
+        nextCursor: null,
         errorMessage: null,
         successMessage: null,
         isLoading: false,
@@ -67,7 +69,7 @@ export default {
         }
       },
   
-      async fetchServices() {
+      async fetchServices(loadMore = false) {
         const token = localStorage.getItem('access_token');
         if (!token) {
           this.setMessage('Unauthorized! Please log in.', 'error');
@@ -77,9 +79,11 @@ export default {
         this.isLoading = true;
         try {
           const response = await axios.get('/customer/view_services', {
-            headers: { Authorization: `Bearer ${token}` }
+            headers: { Authorization: `Bearer ${token}` },
+            params: { cursor: loadMore ? this.nextCursor : undefined }
           });
-          this.services = response.data;
+          this.services = loadMore ? this.services.concat(response.data.items) : response.data.items;
+          this.nextCursor = response.data.next_cursor;
         } catch (error) {
           console.error('Error fetching services:', error);
           const message = error.response?.status === 401 
@@ -22,11 +22,13 @@ export default {
           </tbody>
         </table>
         <p v-else>No users found.</p>
+        <button v-if="nextCursor" class="btn btn-secondary" @click="fetchUsers(true)">Load more</button>
       </div>
     `,
     data() {
       return {
         users: [],
+        nextCursor: null,
         errorMessage: null,
       };
     },
@@ -34,10 +36,11 @@ export default {
       this.fetchUsers();
     },
     methods: {
-      async fetchUsers() {
+      async fetchUsers(loadMore = false) {
         try {
           const token = localStorage.getItem('access_token');
-          const response = await fetch('/admin/view_users', {
+          const query = loadMore && this.nextCursor ? `?cursor=${encodeURIComponent(this.nextCursor)}` : '';
+          const response = await fetch(`/admin/view_users${query}`, {
             method: 'GET',
             headers: {
               'Authorization': `Bearer ${token}`
@@ -46,8 +49,8 @@ export default {
   
           if (response.ok) {
             const data = await response.json();
-            this.users = data;
-            console.log("hi");
+            this.users = loadMore ? this.users.concat(data.items) : data.items;
+            this.nextCursor = data.next_cursor;
           } else {
             const errorData = await response.json();
             this.errorMessage = errorData.msg || 'Failed to fetch users!';
@@ -20,6 +20,7 @@ import ViewService from "./components/View_Service.js"
 import ViewProf from "./components/View_professionals.js"
 import viewuser from "./components/View_Users.js"
 import viewServiceProf from "./components/view_service_professional.js"
+import Availability from "./components/Availability.js"
 
 const routes=[
     {path:'/', component: Home},
@@ -43,7 +44,8 @@ const routes=[
     { path: '/customer/view_services', component: ViewService },
     { path: '/customer/view_professionals', component: ViewProf },
     { path: '/admin/view_users', component: viewuser },
-    { path: '/professional/view_services', component: viewServiceProf }
+    { path: '/professional/view_services', component: viewServiceProf },
+    { path: '/professional/availability', component: Availability }
 
 
     
@@ -0,0 +1,94 @@
+from collections import defaultdict
+from counters import snapshot, track_many
+from models import db, ServiceRequest
+from outbox import notify_status_changes
+
+# Status changes a professional makes to their service requests, one or many
+# at a time. Ownership and the current status of every item are read in one
+# query. Updates are grouped into one UPDATE ... WHERE servicerequest_id IN
+# (...) per (action, current status) pair. The WHERE also repeats the
+# professional and the status that was read, so a row someone else changed
+# in between is left alone and reported as a conflict. The counter deltas
+# then match exactly what was written, and each customer whose request moved
+# gets an email through the outbox. The caller commits.
+
+STATUS_ACTIONS = {
+    # action: (new status, statuses it applies to), as offered by the
+    # buttons in Update_Service_Request.js.
+    'accept': ('Accepted', ('Pending',)),
+    'reject': ('Rejected', ('Pending',)),
+    'close': ('Closed', ('Pending', 'Accepted', 'Rejected')),
+}
+BULK_STATUS_MAX_ITEMS = 1000
+
+# Per-item results, with the status code and message the single-item
+# endpoint answers each with.
+RESULT_RESPONSES = {
+    'updated': (200, "Service request updated"),
+    'invalid': (400, "Invalid servicerequest_id or action"),
+    'duplicate': (400, "Service request listed more than once"),
+    'forbidden': (403, "Access forbidden"),
+    'not_found': (404, "Service request not found"),
+    'invalid_transition': (409, "Service request cannot be changed from its current status"),
+    'conflict': (409, "Service request was changed by someone else, please reload"),
+}
+
+
+def apply_status_actions(professional_id, items):
+    # items: list of (servicerequest_id, action). Returns one result dict per
+    # item, in order.
+    results = [{'servicerequest_id': request_id, 'action': action} for request_id, action in items]
+    wanted = {}  # servicerequest_id -> index into items
+    for index, (request_id, action) in enumerate(items):
+        if not isinstance(request_id, int) or isinstance(request_id, bool) or action not in STATUS_ACTIONS:
+            results[index]['result'] = 'invalid'
+        elif request_id in wanted:
+            results[index]['result'] = 'duplicate'
+        else:
+            wanted[request_id] = index
+    if not wanted:
+        return results
+
+    rows = db.session.execute(
+        db.select(ServiceRequest.servicerequest_id, ServiceRequest.customer_id,
+                  ServiceRequest.professional_id, ServiceRequest.status)
+        .where(ServiceRequest.servicerequest_id.in_(wanted))
+    ).all()
+    found = {row.servicerequest_id: row for row in rows}
+
+    groups = defaultdict(list)  # (action, current status) -> [servicerequest_id]
+    for request_id, index in wanted.items():
+        row, action = found.get(request_id), items[index][1]
+        if row is None:
+            results[index]['result'] = 'not_found'
+        elif row.professional_id != professional_id:
+            results[index]['result'] = 'forbidden'
+        elif row.status not in STATUS_ACTIONS[action][1]:
+            results[index].update(result='invalid_transition', status=row.status)
+        else:
+            groups[(action, row.status)].append(request_id)
+
+    changes, notices = [], []
+    for (action, current), request_ids in groups.items():
+        new_status = STATUS_ACTIONS[action][0]
+        updated = set(db.session.execute(
+            db.update(ServiceRequest)
+            .where(ServiceRequest.servicerequest_id.in_(request_ids),
+                   ServiceRequest.professional_id == professional_id,
+                   ServiceRequest.status == current)
+            .values(status=new_status)
+            .returning(ServiceRequest.servicerequest_id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for request_id in request_ids:
+            index = wanted[request_id]
+            if request_id not in updated:
+                results[index]['result'] = 'conflict'
+                continue
+            results[index].update(result='updated', status=new_status)
+            row = found[request_id]
+            changes.append((snapshot(row), (row.customer_id, row.professional_id, new_status)))
+            notices.append((request_id, row.customer_id, new_status))
+    track_many(changes)
+    notify_status_changes(notices)
+    return results
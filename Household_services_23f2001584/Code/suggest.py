@@ -0,0 +1,105 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from models import db, User, Professional, Service
+
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 25
+SUGGEST_MAX_AGE = 300  # seconds before a lookup rebuilds the index from the database
+
+# In-process typeahead index over service names and approved, unblocked
+# professional names.
+#
+# Entries are (key, kind, id, name) tuples in one sorted list, where key is a
+# normalised suffix of the name starting at each word, so "Deep Cleaning"
+# is found by "dee" and by "clea". A lookup bisects to the first key with the
+# prefix and walks forward until keys stop matching; nothing touches the
+# database.
+#
+# The mutation routes update the index in the process that handled them.
+# Other worker processes catch up when their copy is older than
+# SUGGEST_MAX_AGE and the next lookup rebuilds it.
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def normalise(text):
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+def _keys(name):
+    words = normalise(name).split(" ")
+    return {" ".join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.entries = []
+        self.names = {}  # (kind, id) -> indexed name, to find entries on removal
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        services = db.session.execute(db.select(Service.service_id, Service.name)).all()
+        professionals = db.session.execute(
+            db.select(Professional.professional_id, User.name)
+            .join(User, Professional.user_id == User.user_id)
+            .where(Professional.approved == True, User.is_blocked == False)
+        ).all()
+        names = {('service', service_id): name for service_id, name in services}
+        names.update((('professional', professional_id), name) for professional_id, name in professionals)
+        entries = sorted(
+            (key, kind, item_id, name)
+            for (kind, item_id), name in names.items()
+            for key in _keys(name)
+        )
+        with self.lock:
+            self.entries = entries
+            self.names = names
+            self.built_at = time.monotonic()
+
+    def is_stale(self, max_age=SUGGEST_MAX_AGE):
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def add(self, kind, item_id, name):
+        with self.lock:
+            self._remove(kind, item_id)
+            self.names[(kind, item_id)] = name
+            for key in _keys(name):
+                insort(self.entries, (key, kind, item_id, name))
+
+    def remove(self, kind, item_id):
+        with self.lock:
+            self._remove(kind, item_id)
+
+    def _remove(self, kind, item_id):
+        name = self.names.pop((kind, item_id), None)
+        if name is None:
+            return
+        for key in _keys(name):
+            entry = (key, kind, item_id, name)
+            index = bisect_left(self.entries, entry)
+            if index < len(self.entries) and self.entries[index] == entry:
+                del self.entries[index]
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT, kinds=('service', 'professional')):
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self.lock:
+            index = bisect_left(self.entries, (prefix,))
+            while index < len(self.entries) and len(results) < limit:
+                key, kind, item_id, name = self.entries[index]
+                if not key.startswith(prefix):
+                    break
+                index += 1
+                if kind in kinds and (kind, item_id) not in seen:
+                    seen.add((kind, item_id))
+                    results.append({'type': kind, 'id': item_id, 'name': name})
+        return results
+
+
+suggestions = PrefixIndex()
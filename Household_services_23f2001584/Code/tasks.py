@@ -1,116 +1,119 @@
+import os
 from celery import shared_task
-from models import User
-import flask_excel as excel
-from mailservices import send_test_email 
 from datetime import datetime,timedelta
-from models import db, Professional, ServiceRequest,Customer
+from itertools import islice
+from models import db
+from queries import pending_requests_by_professional, monthly_customer_activity
+from exports import export_path, write_service_requests_csv, evict_exports
+from counters import reconcile, total_counts
+from rollups import roll_up_customer_activity
+from outbox import enqueue, enqueue_many, drain, purge_sent
 import logging
 logger = logging.getLogger(__name__)
 
 
-@shared_task(ignore_result=False)
-def download_csv():
-    servicereq_dow=ServiceRequest.query.with_entities(ServiceRequest.servicerequest_id, ServiceRequest.service_id, ServiceRequest.professional_id,ServiceRequest.customer_id,ServiceRequest.status).all()
+@shared_task(bind=True, ignore_result=False)
+def download_csv(self, compress=False, fingerprint=None):
+    # Files are named after the data fingerprint when one is given, so a
+    # finished export can be served again until the data changes; otherwise
+    # after the task id. Rows written are reported through the PROGRESS state.
+    name = f"service_requests_{fingerprint}" if fingerprint else f"service_requests_{self.request.id}"
+    filename = export_path(name, compress=compress)
 
-    users_csv=excel.make_response_from_query_sets(servicereq_dow, ["servicerequest_id","service_id","professional_id","customer_id","status"],"csv",filename="test1.csv")
-    filename="test.csv"
+    def progress(rows_written):
+        self.update_state(state='PROGRESS', meta={'rows_written': rows_written})
 
-    with open(filename, 'wb') as f:
-        f.write(users_csv.data)
+    if not os.path.exists(filename):
+        rows_written = write_service_requests_csv(filename, compress=compress, progress=progress)
+        logger.info(f"Exported {rows_written} service requests to {filename}")
+    evict_exports(keep=(filename,))
     return filename
 @shared_task(ignore_result=False)
 def daily_remainder(to, subject): 
-    send_test_email(to,subject, 'hello')
+    enqueue('reminder', to, subject, 'hello')
+    db.session.commit()
     return "OK"
 
+# Emails are not sent here: the periodic tasks render them into email_outbox,
+# EMAIL_CHUNK_SIZE rows per insert, and drain_email_outbox sends them (see
+# outbox.py). Each run commits once at the end, so a run that fails part way
+# queues nothing and can simply be run again.
+EMAIL_CHUNK_SIZE = int(os.environ.get("EMAIL_CHUNK_SIZE", 50))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def pending_requests_email(name, pending_ids):
+    body = f"""<html><body>
+    Dear {name},<br><br>
+    You have {len(pending_ids)} pending service request(s). Please log in to your account to review and respond to these requests.<br><br>
+    Pending Service Requests:<br>
+    """
+    for request_id in pending_ids:
+        body += f"- Request ID: {request_id}<br>"
+    body += "<br>Best Regards,<br>Service Team</body></html>"
+    return body
+
+
 @shared_task(ignore_result=False)
 def check_pending_service_requests():
     print("Starting task to send emails to professionals with pending service requests")
-    
-    # Get all professionals
-    all_professionals = Professional.query.all()
-    print(f"Total Professionals Count: {len(all_professionals)}")
-    
-    # Debug: Print details for each professional
-    for professional in all_professionals:
-        print(f"Professional: {professional.user.name}")
-        print(f"Service Requests: {[req.status for req in professional.service_requests]}")
-    
-    # Filter professionals with pending service requests
-    professionals_with_pending = [
-        professional for professional in all_professionals
-        if any(request.status == 'Pending' for request in professional.service_requests)
-    ]
-    print(f"Professionals with Pending Requests: {len(professionals_with_pending)}")
-    
-    # Send email alerts to professionals with pending requests
-    for professional in professionals_with_pending:
-        try:
-            pending_requests = [req for req in professional.service_requests if req.status == 'Pending']
-            subject = "Pending Service Requests Alert"
-            body = f"""<html><body>
-            Dear {professional.user.name},<br><br>
-            You have {len(pending_requests)} pending service request(s). Please log in to your account to review and respond to these requests.<br><br>
-            Pending Service Requests:<br>
-            """
-            for request in pending_requests:
-                body += f"- Request ID: {request.servicerequest_id}<br>"
-            body += "<br>Best Regards,<br>Service Team</body></html>"
-            
-            send_test_email(professional.user.email_id, subject, body)
-            print(f"Email sent to: {professional.user.email_id}")
-            print(f"Pending Service Requests for {professional.user.name}:")
-            for request in pending_requests:
-                print(f"- Request ID: {request.servicerequest_id}, Status: {request.status}")
-        except Exception as e:
-            print(f"Email send error for {professional.user.email_id}: {e}")
-    
-    return f"Task completed. Emails sent to {len(professionals_with_pending)} professionals with pending requests."
+    # The counters answer "is anything pending?" without touching
+    # service_requests; the ids for the emails still come from the rows.
+    if not total_counts().get('Pending'):
+        return "Task completed. No pending service requests."
+
+    messages = (
+        (email_id, "Pending Service Requests Alert", pending_requests_email(name, pending_ids))
+        for professional_id, email_id, name, pending_ids in pending_requests_by_professional()
+    )
+    total = 0
+    for chunk in chunked(messages, EMAIL_CHUNK_SIZE):
+        total += enqueue_many('pending_requests', chunk)
+    db.session.commit()
+    return f"Task completed. Queued emails to {total} professionals with pending requests."
+
+
+def previous_month_range(today):
+    # [first day of previous month, first day of this month), both at midnight.
+    first_day_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    first_day_of_previous_month = (first_day_of_month - timedelta(days=1)).replace(day=1)
+    return first_day_of_previous_month, first_day_of_month
+
+
 @shared_task(ignore_result=False)
 def generate_and_send_monthly_report():
     print("generate_and_send_monthly_report task started")
-    
-    # Get the first and last day of the previous month
-    today = datetime.today()
-    print(f"Today's date: {today}")
-    first_day_of_month = today.replace(day=1)
-    print(f"First day of the current month: {first_day_of_month}")
-    last_day_of_previous_month = first_day_of_month - timedelta(days=1)
-    print(f"Last day of the previous month: {last_day_of_previous_month}")
-    first_day_of_previous_month = last_day_of_previous_month.replace(day=1)
-    print(f"First day of the previous month: {first_day_of_previous_month}")
-
-    # Fetch data for the previous month
-    service_requests = ServiceRequest.query.filter(
-        ServiceRequest.request_date >= first_day_of_previous_month,
-        ServiceRequest.request_date <= last_day_of_previous_month
-    ).all()
-    print(f"Fetched service requests: {service_requests}")
-
-    # Group data by customer
-    customer_data = {}
-    for request in service_requests:
-        customer_id = request.customer_id
-        if customer_id not in customer_data:
-            customer_data[customer_id] = {
-                'name': request.customer.user.name,
-                'total_requests': 0,
-                'pending_requests': 0
-            }
-        customer_data[customer_id]['total_requests'] += 1
-        if request.status == 'Pending':
-            customer_data[customer_id]['pending_requests'] += 1
-    print(f"Grouped customer data: {customer_data}")
-
-    # Generate and send simple HTML report
-    for customer_id, data in customer_data.items():
-        html_content = generate_simple_html_report(data)
-        customer_email = Customer.query.get(customer_id).user.email_id
-        print(f"Sending email to {customer_email} with content: {html_content}")
-        send_test_email(customer_email, "Monthly Activity Report", html_content)
-
-    print("Monthly reports sent successfully.")
-    return "Monthly reports sent successfully."
+
+    start, end = previous_month_range(datetime.today())
+    print(f"Reporting on service requests from {start} to {end}")
+    # Normally a no-op: the nightly rollup has already covered the month.
+    roll_up_customer_activity(through=(end - timedelta(days=1)).date(), refresh_days=0)
+
+    # Customer totals are summed from the daily rollup and rendered one
+    # chunk at a time into the outbox.
+    rows = monthly_customer_activity(start, end, batch_size=EMAIL_CHUNK_SIZE)
+    total = 0
+    for batch in chunked(rows, EMAIL_CHUNK_SIZE):
+        total += enqueue_many('monthly_report', [
+            (row.email_id, "Monthly Activity Report", generate_simple_html_report({
+                'name': row.name,
+                'total_requests': row.total_requests,
+                'pending_requests': row.pending_requests,
+            }))
+            for row in batch
+        ])
+    db.session.commit()
+
+    print(f"Monthly reports queued for {total} customers.")
+    return f"Monthly reports queued for {total} customers."
 
 def generate_simple_html_report(data):
     # Generate simple HTML content
@@ -123,4 +126,35 @@ def generate_simple_html_report(data):
     </body>
     </html>
     """
-    return html_content
\ No newline at end of file
+    return html_content
+
+
+@shared_task(ignore_result=False)
+def reconcile_request_counters():
+    # Nightly rebuild of request_counters from service_requests.
+    reconcile()
+    return "Request counters rebuilt."
+
+
+@shared_task(ignore_result=False)
+def roll_up_daily_customer_activity():
+    # Nightly: aggregates yesterday (and any days a failed run missed) into
+    # daily_customer_activity, re-aggregating the last few days as well.
+    days = roll_up_customer_activity()
+    return f"Rolled up {days} day(s) of customer activity."
+
+
+@shared_task(ignore_result=False)
+def drain_email_outbox():
+    # Every OUTBOX_POLL_SECONDS: sends what is due in email_outbox. Runs on
+    # several workers at once share the rows between them.
+    summary = drain()
+    if summary['claimed']:
+        logger.info(f"Email outbox run: {summary}")
+    return summary
+
+
+@shared_task(ignore_result=False)
+def purge_email_outbox():
+    # Nightly: drops sent emails older than OUTBOX_RETENTION_DAYS.
+    return f"Purged {purge_sent()} sent email(s)."
@@ -1,4 +1,6 @@
 from celery import Celery, Task
+from celery.signals import worker_process_init
+from models import db
 
 def celery_init_app(app):
     class FlaskTask(Task):
@@ -8,4 +10,12 @@ def celery_init_app(app):
 
     celery_app = Celery(app.name, task_cls=FlaskTask)
     celery_app.config_from_object("celeryconfig")
-    return celery_app
\ No newline at end of file
+
+    @worker_process_init.connect(weak=False)
+    def reset_database_pool(**kwargs):
+        # Pooled connections must not be shared with the parent across fork;
+        # each child process opens its own.
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+    return celery_app